@@ -0,0 +1,51 @@
+"""Paged backfill of episodes older than a show's first RSS page.
+
+The monitor only sees the newest page of a show's Nyaa search. A crawl walks the following
+pages ("&p=2", "&p=3", ...) until every missing episode has been found or the results run
+out. Each run fetches at most max_pages pages and reports the page to continue from, so a
+long back catalogue is covered over several runs instead of restarting from page 1.
+"""
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+FIRST_PAGE = 2  # page 1 is the monitor's feed
+
+
+def page_url(rss_url, page):
+    """rss_url with Nyaa's page parameter set to page."""
+    parts = urlsplit(rss_url)
+    params = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if name != 'p']
+    if page > 1:
+        params.append(('p', str(page)))
+    return urlunsplit(parts._replace(query=urlencode(params)))
+
+
+def missing_episodes(expected_episodes, last_episode, covered):
+    """Episodes up to expected_episodes (or last_episode when the count is unknown) not in covered."""
+    target = expected_episodes or last_episode or 0
+    return set(range(1, target + 1)) - set(covered)
+
+
+def crawl(fetch_page, start_page, missing, max_pages, page_size):
+    """Walk pages from start_page, collecting the items of the missing episodes.
+
+    fetch_page(page) returns the page's items, or None if the fetch failed. Returns
+    (found, next_page, done): found maps episode -> items, next_page is where the next run
+    starts, and done is True once nothing is missing or the last page has been read.
+    """
+    missing = set(missing)
+    found = {}
+    page = start_page
+    for _ in range(max_pages):
+        if not missing:
+            return found, page, True
+        items = fetch_page(page)
+        if items is None:
+            return found, page, False
+        for item in items:
+            if item['episode'] in missing:
+                found.setdefault(item['episode'], []).append(item)
+        missing -= found.keys()
+        page += 1
+        if len(items) < page_size:
+            return found, page, True  # a short page is the last one
+    return found, page, not missing
@@ -0,0 +1,72 @@
+"""Cached directory-tree browsing for the download folder pickers."""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_TTL = int(os.getenv('DIR_TREE_TTL', 300))
+SCAN_BUDGET = float(os.getenv('DIR_TREE_SCAN_BUDGET', 2.0))
+CACHE_SIZE = 2048
+
+_cache = OrderedDict()  # path -> (mtime, cached_at, children)
+_cache_lock = threading.Lock()
+
+
+def get_roots():
+    """Top-level folders to browse: every drive on Windows, /, /media and /mnt elsewhere."""
+    if os.name == 'nt':
+        import string
+        from ctypes import windll
+
+        roots = []
+        bitmask = windll.kernel32.GetLogicalDrives()
+        for letter in string.ascii_uppercase:
+            if bitmask & 1:
+                drive = f"{letter}:\\"
+                if os.path.isdir(drive):
+                    roots.append(drive)
+            bitmask >>= 1
+        return roots
+    return [root for root in ['/', '/media', '/mnt'] if os.path.isdir(root)]
+
+
+def list_children(path, deadline=None):
+    """Return the subdirectories of path as [{'name', 'path'}].
+
+    Listings are cached while the directory's mtime is unchanged and younger than CACHE_TTL.
+    Returns None if the deadline passed before the scan finished.
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return []
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime and now - cached[1] < CACHE_TTL:
+            _cache.move_to_end(path)
+            return cached[2]
+    children = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if deadline is not None and time.monotonic() > deadline:
+                    return None
+                try:
+                    if entry.is_dir():
+                        children.append({'name': entry.name, 'path': entry.path})
+                except OSError:
+                    pass
+    except OSError:
+        return []
+    children.sort(key=lambda child: child['name'].lower())
+    with _cache_lock:
+        _cache[path] = (mtime, now, children)
+        _cache.move_to_end(path)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return children
+
+
+def get_root_nodes():
+    return [{'name': root, 'path': root, 'children': None} for root in get_roots()]
@@ -0,0 +1,118 @@
+"""Per-session snapshots of a parsed feed with inverted facet indexes.
+
+The confirm page filters by quality, codecs and language; with a snapshot, a filter change is
+a set intersection over the cached items instead of another fetch and parse of the feed.
+Snapshots are kept per process under the id of the feed_preview job they were built from, so
+another worker process can rebuild one from the persisted job result (see main.load_feed_snapshot).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+SNAPSHOT_TTL = int(os.getenv('FEED_SNAPSHOT_TTL', 1800))
+SNAPSHOT_LIMIT = 64
+
+# Spellings of each quality option found in release titles.
+QUALITY_ALIASES = {
+    '1080p': ['1080p', '1920x1080'],
+    '720p': ['720p', '1280x720'],
+    '480p': ['480p', '854x480'],
+    '2160p': ['2160p', '3840x2160', '4k'],
+    '576p': ['576p', '720x576'],
+    '4k': ['4k', '2160p', '3840x2160'],
+}
+
+_snapshots = OrderedDict()  # snapshot id -> FeedSnapshot
+_snapshots_lock = threading.Lock()
+
+
+class FeedSnapshot:
+    """Items of one feed preview, numbered, with a posting set per facet value."""
+
+    def __init__(self, rss_url, preview):
+        self.rss_url = rss_url
+        self.video_codecs = preview['video_codecs']
+        self.audio_codecs = preview['audio_codecs']
+        self.qualities = preview['qualities']
+        self.group_batch_flags = preview['group_batch_flags']
+        self.created = time.monotonic()
+        self.items = []
+        self.grouped = {}
+        self.index = {facet: defaultdict(set) for facet in ('group', 'video_codec', 'audio_codec', 'language', 'batch')}
+        for group, items in preview['rss_items'].items():
+            self.grouped[group] = []
+            for item in items:
+                item = dict(item, id=len(self.items), group=group)
+                self.items.append(item)
+                self.grouped[group].append(item)
+                self.index['group'][group].add(item['id'])
+                self.index['video_codec'][item['video_codec']].add(item['id'])
+                self.index['audio_codec'][item['audio_codec']].add(item['id'])
+                for language in item['languages']:
+                    self.index['language'][language].add(item['id'])
+                self.index['batch'][item['is_batch']].add(item['id'])
+        self._quality = {}  # selected quality -> ids, filled on first use
+        self._lock = threading.Lock()
+
+    def quality_ids(self, quality):
+        # Matched against the raw title like the original filter, so "1920x1080" counts as 1080p.
+        with self._lock:
+            ids = self._quality.get(quality)
+            if ids is None:
+                aliases = QUALITY_ALIASES.get(quality, [quality])
+                ids = self._quality[quality] = {
+                    item['id'] for item in self.items if any(alias in item['title'] for alias in aliases)
+                }
+            return ids
+
+    def codec_ids(self, facet, codec):
+        codec = codec.lower()
+        ids = set()
+        for value, postings in self.index[facet].items():
+            if codec in value.lower():
+                ids |= postings
+        return ids
+
+    def filter(self, quality='', video_codec='', audio_codec='', language=''):
+        """Ids of the items matching every selected facet (empty selections match anything), ascending."""
+        selected = []
+        if quality:
+            selected.append(self.quality_ids(quality))
+        if video_codec:
+            selected.append(self.codec_ids('video_codec', video_codec))
+        if audio_codec:
+            selected.append(self.codec_ids('audio_codec', audio_codec))
+        if language:
+            selected.append(self.index['language'].get(language, set()))
+        if not selected:
+            return list(range(len(self.items)))
+        selected.sort(key=len)
+        ids = set(selected[0])
+        for postings in selected[1:]:
+            ids &= postings
+        return sorted(ids)
+
+
+def put(snapshot_id, snapshot):
+    """Store snapshot under snapshot_id."""
+    with _snapshots_lock:
+        _snapshots[snapshot_id] = snapshot
+        _snapshots.move_to_end(snapshot_id)
+        while len(_snapshots) > SNAPSHOT_LIMIT:
+            _snapshots.popitem(last=False)
+
+
+def get(snapshot_id):
+    """Return the snapshot if it exists and is younger than SNAPSHOT_TTL, else None."""
+    if not snapshot_id:
+        return None
+    with _snapshots_lock:
+        snapshot = _snapshots.get(snapshot_id)
+        if snapshot is None:
+            return None
+        if time.monotonic() - snapshot.created > SNAPSHOT_TTL:
+            del _snapshots[snapshot_id]
+            return None
+        _snapshots.move_to_end(snapshot_id)
+        return snapshot
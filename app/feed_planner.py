@@ -0,0 +1,114 @@
+"""Merge tracked Nyaa searches into fewer RSS requests and route the results back.
+
+Feeds that differ only in their search query (same host, category, filter,
+uploader, ...) are fetched as one OR query, `(a)|(b)|...`, and each item is
+handed back to every member query it matches.
+"""
+import re
+import zlib
+from collections import namedtuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from title_parser import normalize_title
+
+FeedRequest = namedtuple('FeedRequest', ['url', 'members', 'merged'])
+
+TERM_RE = re.compile(r'(-?)"([^"]*)"|(-?)(\S+)')
+BUCKET_REQUESTS = 4  # merged requests a hash bucket is sized for
+
+
+def split_feed_url(url):
+    """Return (group key, query) for a mergeable Nyaa RSS search URL, else None."""
+    parts = urlsplit(url)
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    if ('page', 'rss') not in params:
+        return None
+    queries = [value for name, value in params if name == 'q']
+    if len(queries) != 1 or not queries[0].strip() or any(c in queries[0] for c in '|()'):
+        return None
+    others = tuple(sorted((name, value) for name, value in params if name != 'q'))
+    return (parts.scheme, parts.netloc.lower(), parts.path, others), queries[0].strip()
+
+
+def with_query(url, query):
+    parts = urlsplit(url)
+    params = [(name, query if name == 'q' else value)
+              for name, value in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit(parts._replace(query=urlencode(params)))
+
+
+def plan_feeds(urls, max_terms=8, max_query_length=400):
+    """Plan the requests that cover every URL in urls.
+
+    Returns FeedRequests whose members are the distinct original URLs each one serves. Queries
+    are grouped into hash buckets of about BUCKET_REQUESTS requests each, so tracking or dropping
+    a show only changes the merged URLs of its own bucket (and everything only when the bucket
+    count doubles or halves). Larger buckets pack requests fuller but change more URLs.
+    """
+    groups = {}
+    plan = []
+    for url in sorted(set(urls)):
+        split = split_feed_url(url)
+        if split is None:
+            plan.append(FeedRequest(url, [url], False))
+        else:
+            groups.setdefault(split[0], []).append((split[1], url))
+    for members in groups.values():
+        buckets = 1
+        while buckets * max_terms * BUCKET_REQUESTS < len(members):
+            buckets *= 2
+        by_bucket = {}
+        for query, url in members:
+            by_bucket.setdefault(zlib.crc32(query.encode('utf-8')) % buckets, []).append((query, url))
+        for bucket in sorted(by_bucket):
+            # A bucket that overflows is split in query order.
+            batch = []
+            length = 0
+            for query, url in by_bucket[bucket]:
+                if batch and (len(batch) >= max_terms or length + len(query) + 3 > max_query_length):
+                    plan.append(merge_queries(batch))
+                    batch, length = [], 0
+                batch.append((query, url))
+                length += len(query) + 3  # "(", ")" and the "|" separator
+            plan.append(merge_queries(batch))
+    return plan
+
+
+def merge_queries(batch):
+    if len(batch) == 1:
+        return FeedRequest(batch[0][1], [batch[0][1]], False)
+    query = '|'.join(f"({query})" for query, _ in batch)
+    return FeedRequest(with_query(batch[0][1], query), [url for _, url in batch], True)
+
+
+def is_merged_url(url):
+    """True for a URL built by merge_queries."""
+    queries = [value for name, value in parse_qsl(urlsplit(url).query) if name == 'q']
+    return len(queries) == 1 and queries[0].startswith('(') and ')|(' in queries[0]
+
+
+def parse_query(query):
+    """Split a Nyaa search into (required terms, excluded terms), each normalized like titles."""
+    required, excluded = [], []
+    for match in TERM_RE.finditer(query):
+        negated = match.group(1) or match.group(3)
+        term = normalize_title(match.group(2) if match.group(2) is not None else match.group(4))
+        if term:
+            (excluded if negated else required).append(term)
+    return required, excluded
+
+
+def query_matches(query, title):
+    words = f" {normalize_title(title)} "
+    required, excluded = parse_query(query)
+    return (all(f" {term} " in words for term in required)
+            and not any(f" {term} " in words for term in excluded))
+
+
+def route_items(items, members):
+    """Split the items of a merged feed into {member url: [items]} by matching titles against each query."""
+    routed = {}
+    for url in members:
+        query = split_feed_url(url)[1]
+        routed[url] = [item for item in items if query_matches(query, item['title'])]
+    return routed
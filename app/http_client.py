@@ -0,0 +1,202 @@
+"""Shared HTTP client for the upstream sites (Nyaa, Jikan).
+
+Every request goes through one pooled session with connect/read timeouts, then a per-host
+token bucket and circuit breaker: after `failure_threshold` consecutive failures (connection
+errors, timeouts, 429 or 5xx) the host is skipped for `cooldown` seconds, after which a single
+trial request decides whether it is back.
+"""
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request to a host whose circuit breaker is open."""
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Block until a token is available; returns False if timeout expires first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None:
+                if time.monotonic() + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+class HostState:
+    def __init__(self, rate, burst):
+        self.limiter = TokenBucket(rate, burst)
+        self.consecutive_failures = 0
+        self.open_until = 0.0  # monotonic; the breaker is open while now < open_until
+        self.probing = False  # a trial request is in flight after the cooldown
+        self.counts = {'requests': 0, 'failures': 0, 'throttled': 0, 'retries': 0, 'skipped': 0}
+        self.last_error = None
+        self.last_error_at = None  # wall clock, for display
+
+
+class HttpClient:
+    def __init__(self, connect_timeout=5, read_timeout=30, pool_size=10, rate=10, burst=20,
+                 failure_threshold=3, cooldown=120, retries=1, backoff=1.0, max_backoff=30.0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.rate = rate
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        # urllib3 keeps one pool of keep-alive connections per host.
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def configure_host(self, host, rate, burst):
+        """Override the rate limit for one host (netloc, e.g. 'api.jikan.moe')."""
+        with self._lock:
+            self._hosts[host.lower()] = HostState(rate, burst)
+
+    def _host(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = HostState(self.rate, self.burst)
+            return state
+
+    def _admit(self, host, state):
+        """Raise CircuitOpenError unless the breaker lets a request to host through."""
+        with self._lock:
+            if state.consecutive_failures < self.failure_threshold:
+                return
+            if time.monotonic() >= state.open_until and not state.probing:
+                state.probing = True  # half-open: this request decides
+                return
+            state.counts['skipped'] += 1
+        metrics.inc('upstream_requests_total', host=host, outcome='skipped')
+        raise CircuitOpenError(f"{host} is failing, skipped until its circuit breaker closes")
+
+    def _record(self, host, state, error=None):
+        with self._lock:
+            state.probing = False
+            state.counts['requests'] += 1
+            if error is None:
+                if state.consecutive_failures >= self.failure_threshold:
+                    logger.info(f"Circuit breaker for {host} closed")
+                state.consecutive_failures = 0
+                metrics.set_gauge('upstream_circuit_open', 0, host=host)
+                outcome = 'success'
+            else:
+                state.counts['failures'] += 1
+                state.consecutive_failures += 1
+                state.last_error = error
+                state.last_error_at = time.time()
+                if state.consecutive_failures >= self.failure_threshold:
+                    if state.consecutive_failures == self.failure_threshold:
+                        logger.warning(f"Circuit breaker for {host} opened after {error}")
+                    state.open_until = time.monotonic() + self.cooldown
+                    metrics.set_gauge('upstream_circuit_open', 1, host=host)
+                outcome = 'failure'
+        metrics.inc('upstream_requests_total', host=host, outcome=outcome)
+
+    def get(self, url, **kwargs):
+        """GET url; 429 and 5xx responses are retried (honouring Retry-After) and then returned.
+
+        Raises CircuitOpenError if the host is being skipped, or requests.RequestException if
+        the connection fails on every attempt. Pass stream=True to read the body incrementally.
+        """
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+        host = urlparse(url).netloc.lower()
+        state = self._host(host)
+        for attempt in range(self.retries + 1):
+            self._admit(host, state)
+            last = attempt == self.retries
+            try:
+                if not state.limiter.acquire(timeout=self.read_timeout):
+                    raise requests.Timeout(f"Rate limiter for {host} timed out")
+                try:
+                    with metrics.timer('upstream_request_seconds', host=host):
+                        resp = self.session.get(url, **kwargs)
+                except requests.RequestException as e:
+                    self._record(host, state, f"{type(e).__name__}: {e}")
+                    if last:
+                        raise
+                    delay = None
+                else:
+                    if resp.status_code != 429 and resp.status_code < 500:
+                        self._record(host, state)
+                        return resp
+                    self._record(host, state, f"HTTP {resp.status_code}")
+                    if resp.status_code == 429:
+                        with self._lock:
+                            state.counts['throttled'] += 1
+                    if last:
+                        return resp
+                    retry_after = resp.headers.get('Retry-After', '')
+                    delay = float(retry_after) if retry_after.isdigit() else None
+                    resp.close()
+            finally:
+                # Whatever happened (even an unexpected exception), a half-open probe is over,
+                # or every later request would be refused as if one were still in flight.
+                with self._lock:
+                    state.probing = False
+            with self._lock:
+                state.counts['retries'] += 1
+            if delay is None:
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+            time.sleep(min(delay, self.max_backoff))
+
+    def health(self):
+        """Per-host counters and breaker state, for the UI."""
+        now = time.monotonic()
+        with self._lock:
+            hosts = []
+            for host, state in sorted(self._hosts.items()):
+                tripped = state.consecutive_failures >= self.failure_threshold
+                if not tripped:
+                    breaker = 'closed'
+                elif now < state.open_until:
+                    breaker = 'open'
+                else:
+                    breaker = 'half-open'
+                hosts.append(dict(
+                    state.counts,
+                    host=host,
+                    breaker=breaker,
+                    retry_in=max(0, round(state.open_until - now)) if breaker == 'open' else 0,
+                    consecutive_failures=state.consecutive_failures,
+                    last_error=state.last_error,
+                    last_error_at=state.last_error_at,
+                ))
+            return hosts
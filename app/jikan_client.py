@@ -0,0 +1,69 @@
+"""Cached, rate-limited Jikan (MyAnimeList) API client."""
+import logging
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class JikanClient:
+    """Jikan requests go through a TTL cache, then coalesce with identical
+    in-flight requests, then go out through the shared http_client.HttpClient,
+    whose per-host token bucket is set to `rate`."""
+
+    def __init__(self, base_url, cache, http, rate=2, burst=3, timeout=10, search_ttl=3600, anime_ttl=86400):
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache  # needs get(key) -> value or None, and set(key, value, ttl)
+        self.http = http
+        self.http.configure_host(urlparse(self.base_url).netloc, rate, burst)
+        self.timeout = timeout
+        self.search_ttl = search_ttl
+        self.anime_ttl = anime_ttl
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def search(self, query, limit=5):
+        key = f"search:{query.strip().lower()}:{limit}"
+        return self._cached(key, self.search_ttl, '', {'q': query, 'limit': limit}) or []
+
+    def anime(self, mal_id):
+        return self._cached(f"anime:{mal_id}", self.anime_ttl, f"/{mal_id}", None)
+
+    def _cached(self, key, ttl, path, params):
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result(timeout=self.timeout * 3)
+        try:
+            value = self._fetch(path, params)
+            if value is not None:
+                self.cache.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _fetch(self, path, params):
+        # Rate limiting, 429 retries and the circuit breaker are handled by the HTTP client.
+        try:
+            resp = self.http.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning(f"Jikan request failed: {e}")
+            return None
+        if resp.status_code != 200:
+            logger.warning(f"Jikan returned {resp.status_code} for {path or 'search'}")
+            return None
+        return resp.json().get('data')
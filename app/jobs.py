@@ -0,0 +1,131 @@
+"""Background job queue: slow upstream work runs on worker threads while the UI polls for the result."""
+import contextlib
+import logging
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Runs registered handlers on worker threads.
+
+    Job state lives in a store (see main.JobStore), so it outlives the request that
+    started the job and unfinished jobs can be resumed after a restart. Running jobs are
+    claimed under this queue's owner id and their heartbeat is refreshed every `heartbeat`
+    seconds; resume() only takes over jobs whose heartbeat stopped, so jobs another live
+    process is running are left alone.
+    """
+
+    def __init__(self, store, workers=4, context=contextlib.nullcontext, heartbeat=30):
+        self.store = store
+        self.workers = workers
+        self.context = context  # entered around every handler call, e.g. app.app_context
+        self.heartbeat = heartbeat
+        self.owner = uuid.uuid4().hex
+        self.handlers = {}
+        self._queue = queue.Queue()
+        self._threads = []
+        self._running = set()  # ids of the jobs this queue's workers are running
+        self._lock = threading.Lock()
+
+    def handler(self, kind):
+        """Decorator registering func as the handler for jobs of this kind."""
+        def register(func):
+            self.handlers[kind] = func
+            return func
+        return register
+
+    def submit(self, kind, params=None, key=None, max_age=None):
+        """Queue a job and return its id.
+
+        With a key, a queued or running job for the same kind and key is reused, as is one
+        that finished less than max_age seconds ago.
+        """
+        if key is not None:
+            job_id = self.store.find(kind, key, max_age or 0)
+            if job_id:
+                return job_id
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, kind, key, params or {})
+        self._enqueue(job_id)
+        return job_id
+
+    def resume(self):
+        """Requeue queued jobs, and running jobs whose owner stopped sending heartbeats."""
+        for job_id in self.store.unfinished(stale_after=self.heartbeat * 3):
+            self._enqueue(job_id)
+
+    def status(self, job_id):
+        return self.store.get(job_id)
+
+    def result(self, job_id):
+        return self.store.get(job_id, with_result=True)
+
+    def _enqueue(self, job_id):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+                if len(self._threads) == 1:
+                    threading.Thread(target=self._beat, name='job-heartbeat', daemon=True).start()
+        self._queue.put(job_id)
+
+    def _beat(self):
+        while True:
+            time.sleep(self.heartbeat)
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                self.store.heartbeat(self.owner, running)
+            except Exception as e:
+                logger.warning(f"Job heartbeat failed: {e}")
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                job = self.store.claim(job_id, self.owner)
+            except Exception as e:
+                logger.error(f"Could not claim job {job_id}: {e}")
+                continue
+            if job is None:
+                continue  # already claimed by another worker, or purged
+            with self._lock:
+                self._running.add(job_id)
+            handler = self.handlers.get(job['kind'])
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler for job kind {job['kind']!r}")
+                with self.context():
+                    result = handler(**job['params'])
+            except Exception as e:
+                logger.error(f"Job {job_id} ({job['kind']}) failed: {e}")
+                self._record(job_id, None, str(e))
+            else:
+                self._record(job_id, result, None)
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _record(self, job_id, result, error):
+        # A store error (a locked database, a result that cannot be serialized) must not end the
+        # worker thread; the job is marked failed instead if at all possible.
+        try:
+            if error is None:
+                self.store.finish(job_id, result)
+            else:
+                self.store.fail(job_id, error)
+            return
+        except Exception as e:
+            logger.error(f"Could not record the outcome of job {job_id}: {e}")
+            error = f"Could not record the job's outcome: {e}"
+        try:
+            self.store.fail(job_id, error)
+        except Exception as e:
+            # Its heartbeat stops with this, so resume() eventually runs the job again.
+            logger.error(f"Could not mark job {job_id} failed: {e}")
@@ -1,37 +1,74 @@
 import os
 import sys
-import requests
 import xml.etree.ElementTree as ET
-import re
 import time
 import collections
 import signal
+import stat
 import subprocess
 import base64
 import secrets
-from flask import Flask, render_template, request, session, redirect, url_for, abort, flash, jsonify
+import sqlite3
+import threading
+import json
+import hashlib
+import io
+import queue
+import socket
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, render_template, request, session, redirect, url_for, abort, flash, jsonify, g, send_from_directory, Response
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Engine
 from apscheduler.schedulers.background import BackgroundScheduler
 from dotenv import load_dotenv
-from urllib.parse import quote_plus
-from functools import wraps
-from datetime import datetime
+from urllib.parse import quote_plus, urlparse
+from functools import partial, wraps
+from datetime import datetime, timedelta, timezone as dt_timezone
+from email.utils import parsedate_to_datetime
 from pytz import timezone
+from title_parser import parse_title, parse_episode, VIDEO_CODEC_FAMILIES
+import backfill
+import dir_tree
+import feed_index
+import jobs
+import feed_planner
+import http_client
+import metrics
+import polling
+import profiler
+from jikan_client import JikanClient
+from qb_client import QBittorrentError, get_client as get_qb_client, get_status_feed, get_sync as get_torrent_sync
 
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY") or secrets.token_urlsafe(32)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///anime.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///anime.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy(app)
-scheduler = BackgroundScheduler()
-scheduler.start()
 
-JIKAN_API_URL = "https://api.jikan.moe/v4/anime"
-NYAA_RSS_URL = "https://nyaa.si/?page=rss&q={}&c=0_0&f=2"
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets the web UI read while the scheduler writes; busy_timeout waits out short write locks.
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA cache_size=-16000')
+    cursor.close()
+scheduler = BackgroundScheduler()  # started by start_scheduler(), never at import
+
+JIKAN_API_URL = os.getenv("JIKAN_API_URL", "https://api.jikan.moe/v4/anime")
+NYAA_URL = os.getenv("NYAA_URL", "https://nyaa.si").rstrip('/')
+NYAA_RSS_URL = NYAA_URL + "/?page=rss&q={}&c=0_0&f=2"
 
 ALL_LANGUAGES = [
     "ENG", "JPN", "SPA", "SPA-LA", "POR", "POR-BR", "FRE", "GER", "ITA", "RUS", "ARA", "KOR", "ZHO", "THA", "VIE",
@@ -42,18 +79,26 @@ ALL_LANGUAGES = [
 ]
 
 # --- Rotating API Token ---
-ROTATING_API_TOKEN = secrets.token_urlsafe(32)
+# Kept in the settings table so every worker process hands out and accepts the same token;
+# the scheduler lease holder rotates it.
+API_TOKEN_KEY = 'api_token'
 ROTATE_INTERVAL = 3600  # seconds (1 hour)
 
 def rotate_api_token():
-    global ROTATING_API_TOKEN
-    ROTATING_API_TOKEN = secrets.token_urlsafe(32)
-    app.logger.info(f"API token rotated: {ROTATING_API_TOKEN}")
-
-scheduler.add_job(rotate_api_token, 'interval', seconds=ROTATE_INTERVAL)
+    token = secrets.token_urlsafe(32)
+    set_setting(API_TOKEN_KEY, token)
+    app.logger.info(f"API token rotated: {token}")
+    return token
 
 def get_current_api_token():
-    return ROTATING_API_TOKEN
+    token = get_setting(API_TOKEN_KEY)
+    if not token:
+        try:
+            token = rotate_api_token()
+        except IntegrityError:
+            db.session.rollback()  # another worker created the first token at the same moment
+            token = load_settings()[API_TOKEN_KEY]
+    return token
 
 # --- End Rotating API Token ---
 
@@ -68,6 +113,23 @@ class TrackedAnime(db.Model):
     status = db.Column(db.String(50), default='Unknown')
     expected_episodes = db.Column(db.Integer, default=0)
     airing_date = db.Column(db.DateTime, nullable=True)  # <-- Add this line
+    next_poll_at = db.Column(db.DateTime, nullable=True, index=True)  # naive UTC; None means due now
+    poll_interval = db.Column(db.Integer, nullable=True)  # current back-off interval in seconds
+    backfill_page = db.Column(db.Integer, nullable=True)  # next results page the backfill crawl reads
+    backfill_done = db.Column(db.Boolean, default=False)  # every missing episode found, or results exhausted
+    feed_checked_at = db.Column(db.DateTime, nullable=True)  # naive UTC; every release since was read from the feed
+    seen_items = db.relationship('SeenItem', backref='anime', lazy='dynamic', cascade='all, delete-orphan')
+    __table_args__ = (db.Index('ix_tracked_anime_title_rss_save', 'title', 'rss_url', 'save_path'),)
+
+class SeenItem(db.Model):
+    # Ledger of feed items the monitor has already processed for a show, keyed by Nyaa guid (or link).
+    id = db.Column(db.Integer, primary_key=True)
+    anime_id = db.Column(db.Integer, db.ForeignKey('tracked_anime.id'), nullable=False)
+    item_key = db.Column(db.String(500), nullable=False)
+    episode = db.Column(db.Integer, default=0)
+    published = db.Column(db.DateTime, nullable=True)  # item pubDate, naive UTC
+    seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.Index('ix_seen_item_anime_key', 'anime_id', 'item_key', unique=True),)
 
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME").strip('"')
 ADMIN_PASSWORD_B64 = os.getenv("ADMIN_PASSWORD_HASH")
@@ -77,9 +139,232 @@ class Setting(db.Model):
     key = db.Column(db.String(100), unique=True, nullable=False)
     value = db.Column(db.String(500), nullable=False)
 
+class FeedCache(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    rss_url = db.Column(db.String(500), unique=True, nullable=False)
+    etag = db.Column(db.String(200), nullable=True)
+    last_modified = db.Column(db.String(100), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)
+    items = db.Column(db.Text, nullable=False, default='[]')  # JSON list of parsed item dicts
+    fetched_at = db.Column(db.DateTime, nullable=True)
+
+class DiskEpisodeIndex(db.Model):
+    # Episode numbers found in a save_path, valid while the directory's mtime is unchanged.
+    id = db.Column(db.Integer, primary_key=True)
+    save_path = db.Column(db.String(500), unique=True, nullable=False)
+    mtime = db.Column(db.Float, nullable=True)
+    episodes = db.Column(db.Text, nullable=False, default='[]')
+    scanned_at = db.Column(db.DateTime, nullable=True)
+
+class JikanCache(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(300), unique=True, nullable=False)
+    value = db.Column(db.Text, nullable=False)  # JSON
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class JikanCacheStore:
+    """SQLite-backed TTL cache for JikanClient."""
+
+    def get(self, key):
+        with app.app_context():
+            entry = JikanCache.query.filter_by(key=key).first()
+            if entry is None:
+                return None
+            if entry.expires_at <= datetime.utcnow():
+                db.session.delete(entry)
+                db.session.commit()
+                return None
+            return json.loads(entry.value)
+
+    def set(self, key, value, ttl):
+        with app.app_context():
+            entry = JikanCache.query.filter_by(key=key).first() or JikanCache(key=key)
+            entry.value = json.dumps(value)
+            entry.expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+            db.session.add(entry)
+            try:
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.warning(f"Jikan cache write failed for {key}: {str(e)}")
+
+class Job(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    key = db.Column(db.String(500), nullable=True, index=True)
+    state = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    result = db.Column(db.Text, nullable=True)  # JSON
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    owner = db.Column(db.String(32), nullable=True)  # JobQueue.owner of the process running it
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # refreshed by the owner while running
+
+    def to_dict(self, with_result=False):
+        data = {
+            'id': self.id,
+            'kind': self.kind,
+            'state': self.state,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if with_result:
+            data['result'] = json.loads(self.result) if self.result else None
+        return data
+
+class SchedulerLease(db.Model):
+    # One row per lease; the process named in holder runs the scheduled jobs until expires_at.
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(200), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)  # naive UTC
+
+JOB_RETENTION = int(os.getenv('JOB_RETENTION', 86400))  # seconds finished jobs are kept
+
+class JobStore:
+    """SQLite-backed job state for jobs.JobQueue."""
+
+    def create(self, job_id, kind, key, params):
+        with app.app_context():
+            cutoff = datetime.utcnow() - timedelta(seconds=JOB_RETENTION)
+            Job.query.filter(Job.state.in_(['done', 'failed']), Job.finished_at < cutoff).delete(
+                synchronize_session=False
+            )
+            db.session.add(Job(id=job_id, kind=kind, key=key, params=json.dumps(params)))
+            db.session.commit()
+
+    def find(self, kind, key, max_age):
+        with app.app_context():
+            cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+            job = Job.query.filter(
+                Job.kind == kind,
+                Job.key == key,
+                db.or_(Job.state.in_(['queued', 'running']), db.and_(Job.state == 'done', Job.finished_at >= cutoff))
+            ).order_by(Job.created_at.desc()).first()
+            return job.id if job else None
+
+    def claim(self, job_id, owner):
+        with app.app_context():
+            now = datetime.utcnow()
+            claimed = Job.query.filter_by(id=job_id, state='queued').update(
+                {'state': 'running', 'started_at': now, 'owner': owner, 'heartbeat_at': now}
+            )
+            db.session.commit()
+            if not claimed:
+                return None
+            job = db.session.get(Job, job_id)
+            return {'kind': job.kind, 'params': json.loads(job.params)}
+
+    def _close(self, job_id, **fields):
+        with app.app_context():
+            Job.query.filter_by(id=job_id).update(dict(fields, finished_at=datetime.utcnow()))
+            db.session.commit()
+
+    def finish(self, job_id, result):
+        self._close(job_id, state='done', result=json.dumps(result))
+
+    def fail(self, job_id, error):
+        self._close(job_id, state='failed', error=error)
+
+    def get(self, job_id, with_result=False):
+        with app.app_context():
+            job = db.session.get(Job, job_id)
+            return job.to_dict(with_result) if job else None
+
+    def heartbeat(self, owner, job_ids):
+        with app.app_context():
+            Job.query.filter(Job.id.in_(job_ids), Job.state == 'running', Job.owner == owner).update(
+                {'heartbeat_at': datetime.utcnow()}, synchronize_session=False
+            )
+            db.session.commit()
+
+    def unfinished(self, stale_after):
+        # Running jobs are only taken over once their owner has stopped sending heartbeats.
+        with app.app_context():
+            cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+            Job.query.filter(
+                Job.state == 'running', db.func.coalesce(Job.heartbeat_at, Job.started_at) < cutoff
+            ).update({'state': 'queued', 'started_at': None, 'owner': None, 'heartbeat_at': None},
+                     synchronize_session=False)
+            db.session.commit()
+            return [job_id for (job_id,) in db.session.query(Job.id).filter_by(state='queued').order_by(Job.created_at)]
+
+job_queue = jobs.JobQueue(
+    JobStore(), workers=int(os.getenv('JOB_WORKERS', 4)), context=app.app_context,
+    heartbeat=int(os.getenv('JOB_HEARTBEAT', 30))
+)
+
+# Shared by every Nyaa and Jikan request: pooled connections, timeouts, per-host rate limits
+# and circuit breakers (see http_client).
+upstream = http_client.HttpClient(
+    connect_timeout=float(os.getenv('HTTP_CONNECT_TIMEOUT', 5)),
+    read_timeout=float(os.getenv('HTTP_READ_TIMEOUT', 30)),
+    rate=float(os.getenv('HTTP_RATE', 10)),
+    burst=int(os.getenv('HTTP_BURST', 20)),
+    failure_threshold=int(os.getenv('HTTP_FAILURE_THRESHOLD', 3)),
+    cooldown=int(os.getenv('HTTP_COOLDOWN', 120))
+)
+
+jikan = JikanClient(
+    JIKAN_API_URL,
+    JikanCacheStore(),
+    upstream,
+    rate=float(os.getenv('JIKAN_RATE', 2)),
+    search_ttl=int(os.getenv('JIKAN_SEARCH_TTL', 3600)),
+    anime_ttl=int(os.getenv('JIKAN_ANIME_TTL', 86400))
+)
+
+def migrate_db():
+    """Create missing tables, then add columns and indexes that older anime.db files lack."""
+    db.create_all()
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=db.engine.dialect)}'
+                if column.default is not None and column.default.is_scalar:
+                    default = column.default.arg
+                    ddl += f' DEFAULT {int(default) if isinstance(default, bool) else repr(default)}'
+                app.logger.info(f"Migrating: {ddl}")
+                conn.execute(db.text(ddl))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+# --- Settings cache ---
+# Settings are served from memory. Every write bumps a version row so other
+# processes notice within SETTINGS_RECHECK_INTERVAL seconds and reload.
+SETTINGS_VERSION_KEY = '_settings_version'
+SETTINGS_RECHECK_INTERVAL = float(os.getenv('SETTINGS_RECHECK_INTERVAL', 5))
+
+_settings = {'values': None, 'version': None, 'checked_at': 0.0}
+_settings_lock = threading.Lock()
+
+def load_settings():
+    values = {s.key: s.value for s in Setting.query.all()}
+    with _settings_lock:
+        _settings['values'] = values
+        _settings['version'] = values.get(SETTINGS_VERSION_KEY)
+        _settings['checked_at'] = time.monotonic()
+    return values
+
 def get_setting(key, default=None):
-    s = Setting.query.filter_by(key=key).first()
-    return s.value if s else default
+    with _settings_lock:
+        values = _settings['values']
+        due = values is None or time.monotonic() - _settings['checked_at'] > SETTINGS_RECHECK_INTERVAL
+    if due:
+        version = db.session.query(Setting.value).filter_by(key=SETTINGS_VERSION_KEY).scalar()
+        if values is None or version != _settings['version']:
+            values = load_settings()
+        else:
+            with _settings_lock:
+                _settings['checked_at'] = time.monotonic()
+    return values.get(key, default)
 
 def set_setting(key, value):
     s = Setting.query.filter_by(key=key).first()
@@ -88,7 +373,20 @@ def set_setting(key, value):
     else:
         s = Setting(key=key, value=value)
         db.session.add(s)
+    bumped = Setting.query.filter_by(key=SETTINGS_VERSION_KEY).update(
+        {Setting.value: db.cast(db.cast(Setting.value, db.Integer) + 1, db.String)},
+        synchronize_session=False
+    )
+    if not bumped:
+        db.session.add(Setting(key=SETTINGS_VERSION_KEY, value='1'))
+    db.session.flush()
+    version = db.session.query(Setting.value).filter_by(key=SETTINGS_VERSION_KEY).scalar()
     db.session.commit()
+    with _settings_lock:
+        if _settings['values'] is not None:
+            _settings['values'] = dict(_settings['values'], **{key: value, SETTINGS_VERSION_KEY: version})
+            _settings['version'] = version
+            _settings['checked_at'] = time.monotonic()
 
 def is_logged_in():
     return session.get("logged_in", False)
@@ -118,12 +416,74 @@ def logout():
     flash("Logged out.", "info")
     return redirect(url_for('login'))
 
+# --- Metrics ---
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # falls back to the rotating API token
+
+metrics.describe('http_request_seconds', 'Flask request duration by endpoint.')
+metrics.describe('feed_fetch_seconds', 'RSS fetch and parse time per feed (parse_rss_feed).')
+metrics.describe('feed_items', 'Items held for each planned monitor feed after its last fetch.')
+metrics.describe('feed_cache_total', 'Feed cache outcomes and feed planner savings since start.')
+metrics.describe('monitor_pass_seconds', 'Duration of monitor passes that checked at least one show.')
+metrics.describe('scheduler_leader', '1 while this process holds the scheduler lease.')
+metrics.describe('upstream_requests_total', 'Nyaa and Jikan requests by host and outcome (success, failure, skipped).')
+metrics.describe('upstream_circuit_open', '1 while the circuit breaker for a host is open.')
+metrics.describe('backfill_pages_total', 'Older result pages read by the backfill crawl.')
+metrics.describe('qb_logins_total', 'qBittorrent logins by outcome.')
+metrics.describe('disk_index_seconds', 'Time to list the episodes already in a save path.')
+
+@metrics.register_collector
+def collect_feed_cache_stats():
+    with _feed_cache_stats_lock:
+        stats = dict(FEED_CACHE_STATS)
+        feed_items = dict(FEED_ITEMS)
+    return [('counter', 'feed_cache_total', {'outcome': outcome}, value) for outcome, value in stats.items()] + [
+        ('gauge', 'feed_items', {'feed': rss_url}, value) for rss_url, value in feed_items.items()
+    ]
+
+@app.teardown_request
+def finish_request_profile(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.untag_thread()
+        profiler.finish(profile, profile_dir())
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None and request.endpoint != 'metrics_endpoint':
+        metrics.observe(
+            'http_request_seconds',
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unknown',
+            method=request.method,
+            status=str(response.status_code)[0] + 'xx'
+        )
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    auth_header = request.headers.get('Authorization', '')
+    token = auth_header.split(' ', 1)[1] if auth_header.startswith('Bearer ') else ''
+    if not token or not secrets.compare_digest(token, METRICS_TOKEN or get_current_api_token()):
+        return 'Unauthorized\n', 401, {'Content-Type': 'text/plain'}
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 @app.before_request
 def require_login():
-    allowed_routes = {'login', 'static', 'get_api_token', 'set_download_path'}
+    # Metrics and profiler endpoints check the API token themselves, so scripts can call them without a session.
+    allowed_routes = {'login', 'static', 'get_api_token', 'set_download_path', 'metrics_endpoint',
+                      'api_profiler', 'api_profiler_download'}
     if request.endpoint not in allowed_routes and not is_logged_in():
         return redirect(url_for('login'))
 
+# Registered after require_login: a request it redirects is neither timed nor profiled.
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if request.endpoint not in PROFILER_ENDPOINTS:
+        g.profile = profiler.start('request', request.endpoint or 'unknown')
+        profiler.tag_thread(g.profile, f"route {request.endpoint}")
+
 # --- API Authentication Decorator ---
 def api_auth_required(f):
     @wraps(f)
@@ -152,7 +512,7 @@ def api_search():
     rss_url = request.json.get('rss_url', '').strip()
     if not rss_url:
         formatted_title = quote_plus(query)
-        rss_url = f"https://nyaa.si/?page=rss&q={formatted_title}&c=0_0&f=2"
+        rss_url = NYAA_RSS_URL.format(formatted_title)
     results = search_jikan(query)
     return jsonify([{
         'mal_id': a['mal_id'],
@@ -166,10 +526,7 @@ def api_search():
 @api_auth_required
 def api_qb_status():
     try:
-        session_api, qb_url = qb_login()
-        resp = session_api.get(f"{qb_url}/api/v2/torrents/info", params={"filter": "downloading"})
-        torrents = resp.json()
-        return jsonify(torrents)
+        return jsonify(get_downloading_torrents())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -191,38 +548,81 @@ def api_tracking_list():
         for anime in tracked_anime
     ])
 
+# --- Top completed snapshot ---
+TOP_COMPLETED_URL = f"{NYAA_URL}/?page=rss&c=0_0&f=2"
+TOP_COMPLETED_TTL = int(os.getenv('TOP_COMPLETED_TTL', 300))
+SIZE_UNITS = {'B': 1, 'BYTES': 1, 'KIB': 1024, 'MIB': 1024 ** 2, 'GIB': 1024 ** 3, 'TIB': 1024 ** 4}
+
+def parse_size(size):
+    """Convert a Nyaa size such as '1.4 GiB' to bytes (0 if unparseable)."""
+    try:
+        number, unit = size.split()
+        return int(float(number) * SIZE_UNITS[unit.upper()])
+    except (ValueError, KeyError):
+        return 0
+
+TOP_COMPLETED_SORTS = {
+    'downloads': lambda item: item['downloads'],
+    'seeders': lambda item: item['seeders'],
+    'size': lambda item: parse_size(item['size']),
+}
+
+_top_completed = {'views': None, 'fetched_at': 0.0, 'refreshing': False}
+_top_completed_lock = threading.Lock()
+_top_completed_refresh_lock = threading.Lock()
+
+def refresh_top_completed():
+    """Fetch the global feed and presort it once for every key in TOP_COMPLETED_SORTS."""
+    with _top_completed_refresh_lock:
+        try:
+            with upstream.get(TOP_COMPLETED_URL, stream=True) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                items = list(iter_rss_items(response.raw))
+            views = {key: sorted(items, key=sort_key, reverse=True) for key, sort_key in TOP_COMPLETED_SORTS.items()}
+            with _top_completed_lock:
+                _top_completed['views'] = views
+                _top_completed['fetched_at'] = time.monotonic()
+            return views
+        finally:
+            with _top_completed_lock:
+                _top_completed['refreshing'] = False
+
+def background_refresh_top_completed():
+    try:
+        refresh_top_completed()
+    except Exception as e:
+        app.logger.error(f"Top completed refresh failed: {str(e)}")
+
+def get_top_completed():
+    """Return the presorted views, serving a stale snapshot while a refresh runs in the background.
+
+    Returns None until the first snapshot has been loaded by the top_completed job.
+    """
+    with _top_completed_lock:
+        views = _top_completed['views']
+        stale = time.monotonic() - _top_completed['fetched_at'] > TOP_COMPLETED_TTL
+        start_refresh = views is not None and stale and not _top_completed['refreshing']
+        if start_refresh:
+            _top_completed['refreshing'] = True
+    if start_refresh:
+        threading.Thread(target=background_refresh_top_completed, daemon=True).start()
+    return views
+
 @app.route('/top-completed')
 def top_completed():
-    rss_url = "https://nyaa.si/?page=rss&c=0_0&f=2"
     page = int(request.args.get('page', 1))
+    sort = request.args.get('sort', 'downloads')
+    if sort not in TOP_COMPLETED_SORTS:
+        sort = 'downloads'
     per_page = 20
 
     try:
-        response = requests.get(rss_url, timeout=10)
-        response.raise_for_status()
-        root = ET.fromstring(response.content)
-        items = []
-        for item in root.findall('./channel/item'):
-            title = item.findtext('title', '').strip()
-            link = item.findtext('link', '').strip()
-            downloads = item.findtext('{https://nyaa.si/xmlns/nyaa}downloads', '0')
-            seeders = item.findtext('{https://nyaa.si/xmlns/nyaa}seeders', '0')
-            leechers = item.findtext('{https://nyaa.si/xmlns/nyaa}leechers', '0')
-            size = item.findtext('{https://nyaa.si/xmlns/nyaa}size', 'N/A')
-            category = item.findtext('{https://nyaa.si/xmlns/nyaa}category', '')
-            pubDate = item.findtext('pubDate', '')
-            items.append({
-                'title': title,
-                'link': link,
-                'downloads': int(downloads),
-                'seeders': int(seeders),
-                'leechers': int(leechers),
-                'size': size,
-                'category': category,
-                'pubDate': pubDate,
-            })
-        # Sort by downloads descending
-        items.sort(key=lambda x: x['downloads'], reverse=True)
+        views = get_top_completed()
+        if views is None:
+            job = job_queue.status(job_queue.submit('top_completed', key='top_completed'))
+            return render_job_pending(job, "Fetching the latest completed releases...")
+        items = views[sort]
         total = len(items)
         pages = (total + per_page - 1) // per_page
         start = (page - 1) * per_page
@@ -232,11 +632,27 @@ def top_completed():
             'top_completed.html',
             items=page_items,
             page=page,
-            pages=pages
+            pages=pages,
+            sort=sort,
+            sorts=list(TOP_COMPLETED_SORTS)
         )
     except Exception as e:
         return f"Failed to fetch or parse RSS feed: {e}", 500
 
+@app.route('/api/feed-cache-stats')
+@api_auth_required
+def api_feed_cache_stats():
+    with _feed_cache_stats_lock:
+        stats = dict(FEED_CACHE_STATS)
+    stats['hits'] = stats.get('not_modified', 0) + stats.get('unchanged', 0)
+    stats['entries'] = FeedCache.query.count()
+    return jsonify(stats)
+
+@app.route('/api/upstream-health')
+@api_auth_required
+def api_upstream_health():
+    return jsonify(upstream.health())
+
 @app.route('/api/untrack/<int:anime_id>', methods=['POST'])
 @api_auth_required
 def api_untrack(anime_id):
@@ -247,6 +663,35 @@ def api_untrack(anime_id):
         return jsonify({'success': True})
     return jsonify({'error': 'Not found'}), 404
 
+# --- Profiler ---
+PROFILER_ENDPOINTS = {'static', 'api_profiler', 'api_profiler_download', 'qb_status_stream'}  # never profiled themselves, or long-lived
+
+def profile_dir():
+    return os.path.join(app.instance_path, 'profiles')
+
+@app.route('/api/profiler', methods=['GET', 'POST'])
+@api_auth_required
+def api_profiler():
+    """POST {"passes": N, "requests": M} profiles the next N monitor passes and M requests."""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            state = profiler.arm(passes=data.get('passes', 0), requests=data.get('requests', 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'passes and requests must be integers'}), 400
+    else:
+        state = profiler.status()
+    state['profiles'] = [
+        dict(entry, url=url_for('api_profiler_download', name=entry['name']))
+        for entry in profiler.list_profiles(profile_dir())
+    ]
+    return jsonify(state)
+
+@app.route('/api/profiler/<name>')
+@api_auth_required
+def api_profiler_download(name):
+    return send_from_directory(profile_dir(), name, as_attachment=True, mimetype='text/plain')
+
 # --- End API Endpoints ---
 
 # --- Existing Web Endpoints (not API protected) ---
@@ -257,75 +702,200 @@ def resource_path(relative_path):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.abspath("."), relative_path)
 
+@metrics.timed('jikan_search_seconds')
 def search_jikan(query):
-    response = requests.get(JIKAN_API_URL, params={'q': query, 'limit': 5})
-    return response.json().get('data', []) if response.status_code == 200 else []
+    return jikan.search(query, limit=5)
 
+@metrics.timed('feed_preview_seconds')
 def parse_rss_items_for_template(rss_url):
     items = parse_rss_feed(rss_url)
     grouped = collections.defaultdict(list)
-    group_regex = re.compile(r'\[([^\[\]]+)\]')
     video_codecs = set()
     audio_codecs = set()
     languages = set()
     qualities = set()
-    video_codec_regex = re.compile(r'(HEVC|AVC|H\.264|H\.265)', re.IGNORECASE)
-    audio_codec_regex = re.compile(
-        r'(AAC|EAC3|FLAC|AC3|MP3|TRUEHD|DOLBY|ATMOS|DDP|DD|DOLBY DIGITAL|DOLBY TRUEHD|DOLBY ATMOS)',
-        re.IGNORECASE
-    )
-    lang_regex = re.compile(r'\[([A-Z]{2,}(-[A-Z]{2,})?)\]')
-    quality_regex = re.compile(r'([0-9]{3,4}p|4K)', re.IGNORECASE)
     group_batch_flags = {}
     for item in items:
-        title = item.findtext('title', '').strip()
-        match = group_regex.search(title)
-        group = match.group(1) if match else "Other"
-        video_codec_match = video_codec_regex.search(title)
-        audio_codec_match = audio_codec_regex.search(title)
-        video_codec = video_codec_match.group(1).upper() if video_codec_match else ""
-        audio_codec = audio_codec_match.group(1).upper() if audio_codec_match else ""
-        is_batch = '[BATCH]' in title.upper()
-        langs = [m.group(1) for m in lang_regex.finditer(title) if m.group(1) not in [group, video_codec, audio_codec, 'BATCH']]
-        for lang in langs:
-            languages.add(lang)
-        if group not in group_batch_flags:
-            group_batch_flags[group] = False
-        if is_batch:
-            group_batch_flags[group] = True
-        if video_codec:
-            video_codecs.add(video_codec)
-        if audio_codec:
-            audio_codecs.add(audio_codec)
-        quality_match = quality_regex.search(title)
-        if quality_match:
-            qualities.add(quality_match.group(1).lower())
-        grouped[group].append({
-            'title': title,
-            'link': item.findtext('link', '').strip(),
-            'size': item.findtext('{https://nyaa.si/xmlns/nyaa}size', 'N/A'),
-            'seeders': item.findtext('{https://nyaa.si/xmlns/nyaa}seeders', 'N/A'),
-            'leechers': item.findtext('{https://nyaa.si/xmlns/nyaa}leechers', 'N/A'),
-            'video_codec': video_codec,
-            'audio_codec': audio_codec,
-            'is_batch': is_batch,
-            'languages': langs,
+        info = parse_title(item['title'])
+        languages.update(info.languages)
+        group_batch_flags[info.group] = group_batch_flags.get(info.group, False) or info.is_batch
+        if info.video_codec:
+            video_codecs.add(info.video_codec)
+        if info.audio_codec:
+            audio_codecs.add(info.audio_codec)
+        if info.quality:
+            qualities.add(info.quality)
+        grouped[info.group].append({
+            'title': item['title'],
+            'link': item['link'],
+            'size': item['size'],
+            'seeders': item['seeders'],
+            'leechers': item['leechers'],
+            'video_codec': info.video_codec,
+            'audio_codec': info.audio_codec,
+            'is_batch': info.is_batch,
+            'languages': list(info.languages),
         })
     return grouped, sorted(video_codecs), sorted(audio_codecs), sorted(languages), group_batch_flags, sorted(qualities)
 
-def parse_rss_feed(rss_url):
-    namespaces = {'nyaa': 'https://nyaa.si/xmlns/nyaa'}
+NYAA_NS = '{https://nyaa.si/xmlns/nyaa}'
+
+FEED_CACHE_STATS = collections.Counter()
+FEED_ITEMS = {}  # planned monitor feed URL -> items after its last fetch; pruned with the plan
+_feed_cache_stats_lock = threading.Lock()
+
+def count_feed_cache(outcome, n=1):
+    with _feed_cache_stats_lock:
+        FEED_CACHE_STATS[outcome] += n
+
+def rss_item_to_dict(item):
+    title = item.findtext('title', '').strip()
+    link = item.findtext('link', '').strip()
+    return {
+        'title': title,
+        'link': link,
+        'guid': item.findtext('guid', '').strip() or link,
+        'pubDate': item.findtext('pubDate', ''),
+        'size': item.findtext(NYAA_NS + 'size', 'N/A'),
+        'seeders': int(item.findtext(NYAA_NS + 'seeders', '0') or 0),
+        'leechers': int(item.findtext(NYAA_NS + 'leechers', '0') or 0),
+        'downloads': int(item.findtext(NYAA_NS + 'downloads', '0') or 0),
+        'category': item.findtext(NYAA_NS + 'category', ''),
+        'episode': get_episode_number(title),
+    }
+
+NYAA_PAGE_SIZE = 75
+
+def parse_pub_date(value):
+    try:
+        published = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    # Nyaa stamps "-0000", which parses as naive; treat it as UTC so comparisons work.
+    return published if published.tzinfo else published.replace(tzinfo=dt_timezone.utc)
+
+def iter_rss_items(stream):
+    """Yield item dicts from an RSS byte stream without building the tree.
+
+    Parsing advances only as items are consumed, so breaking out of the loop stops it early.
+    """
+    channel = None
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'channel':
+                channel = elem
+            continue
+        if elem.tag != 'item':
+            continue
+        item = rss_item_to_dict(elem)
+        if channel is not None:
+            channel.clear()  # drop the finished item so memory stays flat
+        yield item
+
+class HashingReader:
+    """File-like wrapper that hashes everything read through it."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        chunk = self.raw.read(size)
+        self.sha256.update(chunk)
+        return chunk
+
+    def drain(self):
+        while self.read(65536):
+            pass
+
+def newest_pub_date(items):
+    dates = [d for d in (parse_pub_date(item['pubDate']) for item in items) if d is not None]
+    return max(dates) if dates else None
+
+def oldest_pub_date(items):
+    dates = [d for d in (parse_pub_date(item['pubDate']) for item in items) if d is not None]
+    return min(dates) if dates else None
+
+def parse_rss_feed(rss_url, stop_at_cached=False):
+    """Return the feed's items as dicts, revalidating against the persistent FeedCache."""
+    return fetch_feed(rss_url, stop_at_cached)[0]
+
+@metrics.timed('feed_fetch_seconds')
+def fetch_feed(rss_url, stop_at_cached=False):
+    """Return (items, complete) for the feed, revalidating against the persistent FeedCache.
+
+    With stop_at_cached (the monitor, which only needs new releases), a changed feed is
+    stream-parsed only up to the newest item already cached and older items come from the
+    cache, seeder counts included. Otherwise the whole body is parsed and cached. A body that
+    hashes like the cached one is not parsed at all. complete is
+    False when the fetch failed or a full page held only new items, so older ones may be missing.
+    """
+    entry = FeedCache.query.filter_by(rss_url=rss_url).first()
+    cached_items = json.loads(entry.items) if entry else []
+    headers = {}
+    if entry and entry.etag:
+        headers['If-None-Match'] = entry.etag
+    if entry and entry.last_modified:
+        headers['If-Modified-Since'] = entry.last_modified
     try:
-        response = requests.get(rss_url)
-        root = ET.fromstring(response.content)
-        return root.findall('.//item')
+        with upstream.get(rss_url, headers=headers, stream=True) as response:
+            if response.status_code == 304 and entry:
+                count_feed_cache('not_modified')
+                return cached_items, True
+            response.raise_for_status()
+            response.raw.decode_content = True
+            stream = reader = HashingReader(response.raw)
+            if entry and entry.content_hash:
+                # Hash the whole body before parsing it, so an unchanged feed is never parsed.
+                body = reader.read()
+                stream = io.BytesIO(body) if reader.sha256.hexdigest() != entry.content_hash else None
+            stop_before = newest_pub_date(cached_items) if stop_at_cached else None
+            new_items = []
+            truncated = False
+            for item in iter_rss_items(stream) if stream is not None else ():
+                published = parse_pub_date(item['pubDate'])
+                if stop_before and published and published < stop_before:
+                    truncated = True  # the rest of the feed is already cached
+                    break
+                new_items.append(item)
+            reader.drain()
+        content_hash = reader.sha256.hexdigest()
+        if entry and entry.content_hash == content_hash:
+            count_feed_cache('unchanged')
+            items = cached_items
+        else:
+            count_feed_cache('miss')
+            count_feed_cache('items_parsed', len(new_items))
+            items = new_items
+            if truncated:
+                new_keys = {item['guid'] for item in new_items}
+                older = [item for item in cached_items if item['guid'] not in new_keys]
+                items = (new_items + older)[:max(len(cached_items), NYAA_PAGE_SIZE)]
+            if entry is None:
+                entry = FeedCache(rss_url=rss_url)
+                db.session.add(entry)
+            entry.items = json.dumps(items)
+            entry.content_hash = content_hash
+    except http_client.CircuitOpenError:
+        count_feed_cache('skipped')  # the host is down; try again once its breaker closes
+        return [], False
     except Exception as e:
+        count_feed_cache('error')
         app.logger.error(f"RSS Error: {str(e)}")
-        return []
+        return [], False
+    entry.etag = response.headers.get('ETag')
+    entry.last_modified = response.headers.get('Last-Modified')
+    entry.fetched_at = datetime.utcnow()
+    try:
+        db.session.commit()
+    except Exception as e:
+        # Another worker may have cached the same URL first; the parsed items are still good.
+        db.session.rollback()
+        app.logger.warning(f"Feed cache write failed for {rss_url}: {str(e)}")
+    return items, truncated or len(new_items) < NYAA_PAGE_SIZE
 
 def get_episode_number(title):
-    match = re.search(r'\b(\d{1,3})\b', title)
-    return int(match.group(1)) if match else 0
+    return parse_title(title).episode
 
 def get_best_torrent(items, quality_preference):
     quality_order = ['1080p', '720p', '480p']
@@ -333,162 +903,548 @@ def get_best_torrent(items, quality_preference):
         quality_order.insert(0, quality_preference)
     for quality in quality_order:
         for item in items:
-            title = item.findtext('title', '')
-            if quality.lower() in title.lower():
+            if quality.lower() in item['title'].lower():
                 return item
     return None
 
-def qb_login():
-    qb_url = os.getenv('QB_URL').rstrip('/')
-    username = os.getenv('QB_USERNAME')
-    password = os.getenv('QB_PASSWORD')
-    session = requests.Session()
-    resp = session.post(f"{qb_url}/api/v2/auth/login", data={'username': username, 'password': password})
-    if resp.text != 'Ok.':
-        raise Exception("Failed to login to qBittorrent Web API")
-    return session, qb_url
-
-def qb_add_torrent_url(session, qb_url, torrent_url, save_path, retries=3):
+def clean_save_path(save_path):
     # Remove accidental surrounding quotes and strip whitespace
-    save_path = save_path.strip().strip('"').strip("'")
-    app.logger.info(f"Adding torrent: {torrent_url} to save_path: {save_path!r}")
-    for attempt in range(retries):
-        try:
-            resp = session.post(
-                f"{qb_url}/api/v2/torrents/add",
-                data={'urls': torrent_url, 'savepath': save_path},
-                timeout=15
-            )
-            app.logger.info(f"qBittorrent add response: {resp.status_code} {resp.text}")
-            if resp.status_code == 200:
-                return
-            else:
-                app.logger.error(f"Failed to add torrent (attempt {attempt+1}): {torrent_url} ({resp.text})")
-        except requests.RequestException as e:
-            app.logger.error(f"Exception adding torrent (attempt {attempt+1}): {torrent_url} ({e})")
-        time.sleep(2)
-    raise Exception(f"Failed to add torrent after {retries} attempts: {torrent_url}")
+    return save_path.strip().strip('"').strip("'")
+
+def qb_add_torrent_urls(qb, torrent_urls, save_path):
+    """Add torrent_urls to save_path in one batched call; raises QBittorrentError if qBittorrent keeps refusing."""
+    save_path = clean_save_path(save_path)
+    app.logger.info(f"Adding {len(torrent_urls)} torrent(s) to save_path: {save_path!r}")
+    qb.add_torrents(torrent_urls, save_path)
 
 def rank_torrent(item, preferred_quality, preferred_video_codec, preferred_audio_codec):
+    info = parse_title(item['title'])
     score = 0
-    title = item.findtext('title', '').lower()
-    video_codec = ''
-    audio_codec = ''
-    video_codec = item.findtext('video_codec', '').lower() if item.find('video_codec') is not None else ''
-    audio_codec = item.findtext('audio_codec', '').lower() if item.find('audio_codec') is not None else ''
-    if not video_codec:
-        if 'hevc' in title or 'h.265' in title:
-            video_codec = 'hevc'
-        elif 'avc' in title or 'h.264' in title:
-            video_codec = 'avc'
-    if not audio_codec:
-        if 'eac3' in title:
-            audio_codec = 'eac3'
-        elif 'aac' in title:
-            audio_codec = 'aac'
-        elif 'flac' in title:
-            audio_codec = 'flac'
-        elif 'ac3' in title:
-            audio_codec = 'ac3'
-        elif 'mp3' in title:
-            audio_codec = 'mp3'
-    if preferred_quality and preferred_quality.lower() in title:
-        pass
-    else:
+    if not (preferred_quality and preferred_quality.lower() == info.quality):
         score += 10
-    if preferred_video_codec and preferred_video_codec.lower() in video_codec:
-        pass
-    else:
+    video_codec = VIDEO_CODEC_FAMILIES.get(info.video_codec, info.video_codec.lower())
+    if not (preferred_video_codec and preferred_video_codec.lower() in video_codec):
         score += 5
-    if preferred_audio_codec and preferred_audio_codec.lower() in audio_codec:
-        pass
-    else:
+    if not (preferred_audio_codec and preferred_audio_codec.lower() in info.audio_codec.lower()):
         score += 2
     return score
 
-def get_existing_episodes(save_path):
-    """Return a set of episode numbers found in the save_path directory."""
-    if not os.path.isdir(save_path):
-        return set()
+DISK_INDEX_MAX_AGE = int(os.getenv('DISK_INDEX_MAX_AGE', 21600))
+
+def scan_episode_files(save_path):
     episode_nums = set()
-    episode_pattern = re.compile(r'\b(\d{1,3})\b')
     for fname in os.listdir(save_path):
-        match = episode_pattern.search(fname)
-        if match:
-            episode_nums.add(int(match.group(1)))
+        # Plain regex rather than parse_title: filenames would only churn the title cache.
+        ep_num = parse_episode(fname)
+        if ep_num:
+            episode_nums.add(ep_num)
     return episode_nums
 
-def get_downloading_episodes(session_api, qb_url, save_path):
-    """Return a set of episode numbers currently downloading to save_path."""
-    episode_nums = set()
+@metrics.timed('disk_index_seconds')
+def get_existing_episodes(save_path):
+    """Return a set of episode numbers found in the save_path directory, rescanning only when it changed."""
     try:
-        resp = session_api.get(f"{qb_url}/api/v2/torrents/info")
-        for torrent in resp.json():
-            if torrent.get("save_path", "").rstrip("\\/") == save_path.rstrip("\\/"):
-                match = re.search(r'\b(\d{1,3})\b', torrent.get("name", ""))
-                if match:
-                    episode_nums.add(int(match.group(1)))
-    except Exception:
-        pass
+        st = os.stat(save_path)
+    except OSError:
+        return set()
+    if not stat.S_ISDIR(st.st_mode):
+        return set()
+    key = normalize_save_path(save_path)
+    entry = DiskEpisodeIndex.query.filter_by(save_path=key).first()
+    now = datetime.utcnow()
+    if (
+        entry
+        and entry.mtime == st.st_mtime
+        and entry.scanned_at
+        and (now - entry.scanned_at).total_seconds() < DISK_INDEX_MAX_AGE
+    ):
+        return set(json.loads(entry.episodes))
+    episode_nums = scan_episode_files(save_path)
+    if entry is None:
+        entry = DiskEpisodeIndex(save_path=key)
+        db.session.add(entry)
+    # A change within the mtime granularity of the scan could go unnoticed, so don't trust a fresh mtime.
+    entry.mtime = st.st_mtime if time.time() - st.st_mtime > 2 else None
+    entry.episodes = json.dumps(sorted(episode_nums))
+    entry.scanned_at = now
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.warning(f"Episode index write failed for {save_path}: {str(e)}")
     return episode_nums
 
+def get_indexed_episodes(save_paths):
+    """Episodes on disk per save_path from the index alone, without touching the filesystem."""
+    keys = {normalize_save_path(path): path for path in save_paths}
+    entries = DiskEpisodeIndex.query.filter(DiskEpisodeIndex.save_path.in_(list(keys))).all() if keys else []
+    return {keys[entry.save_path]: set(json.loads(entry.episodes)) for entry in entries}
+
+def normalize_save_path(path):
+    return os.path.normcase(path.strip().strip('"').strip("'").rstrip("\\/"))
+
+def build_downloading_index(torrents):
+    """Map normalized save_path -> set of episode numbers for torrents known to qBittorrent."""
+    index = collections.defaultdict(set)
+    for torrent in torrents:
+        ep_num = get_episode_number(torrent.get("name", ""))
+        if ep_num:
+            index[normalize_save_path(torrent.get("save_path", ""))].add(ep_num)
+    return index
+
+def get_downloading_index(qb):
+    try:
+        torrent_sync = get_torrent_sync()
+        torrent_sync.refresh()
+        torrents = torrent_sync.snapshot()
+    except Exception as e:
+        app.logger.warning(f"qBittorrent sync failed, falling back to torrents/info: {str(e)}")
+        torrents = qb.torrents_info()
+    return build_downloading_index(torrents)
+
+# --- Monitor pipeline ---
+MONITOR_WORKERS = int(os.getenv('MONITOR_WORKERS', 8))
+MONITOR_PER_HOST = int(os.getenv('MONITOR_PER_HOST', 4))
+
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+
+def host_limit(url):
+    """Return the semaphore bounding concurrent requests to url's host."""
+    host = urlparse(url).netloc.lower()
+    with _host_limits_lock:
+        limit = _host_limits.get(host)
+        if limit is None:
+            limit = _host_limits[host] = threading.BoundedSemaphore(MONITOR_PER_HOST)
+        return limit
+
+# --- Feed planning ---
+FEED_MERGE_MAX = int(os.getenv('FEED_MERGE_MAX', 8))  # shows per merged Nyaa query; 1 disables merging
+
+def plan_monitor_feeds():
+    """Plan requests for every tracked feed, so merged URLs (and their FeedCache rows) stay stable between passes."""
+    tracked = db.session.query(TrackedAnime.rss_url, TrackedAnime.poll_interval).all()
+    # Shows never polled before are fetched alone, so their back catalogue is not cut off by a merged page.
+    polled = {rss_url for rss_url, interval in tracked if interval is not None}
+    plan = feed_planner.plan_feeds(polled, max_terms=FEED_MERGE_MAX)
+    planned = {url for feed in plan for url in feed.members}
+    plan += [
+        feed_planner.FeedRequest(url, [url], False)
+        for url in sorted({rss_url for rss_url, _ in tracked} - planned)
+    ]
+    return plan
+
+def prune_unplanned_feeds(plan):
+    """Delete cached merged feeds that are no longer planned (nothing would revalidate them
+    again) and their feed_items series."""
+    planned = {feed.url for feed in plan}
+    with _feed_cache_stats_lock:
+        for rss_url in set(FEED_ITEMS) - planned:
+            del FEED_ITEMS[rss_url]
+    stale = [
+        rss_url for (rss_url,) in db.session.query(FeedCache.rss_url)
+        if rss_url not in planned and feed_planner.is_merged_url(rss_url)
+    ]
+    if stale:
+        FeedCache.query.filter(FeedCache.rss_url.in_(stale)).delete(synchronize_session=False)
+        db.session.commit()
+
+def feed_marks(pending):
+    """Per feed URL, the time up to which its shows have read every release (the oldest across
+    shows sharing it), or None if one of them never has."""
+    marks = {}
+    for anime in pending:
+        mark = anime.feed_checked_at
+        if anime.rss_url in marks:
+            other = marks[anime.rss_url]
+            mark = None if mark is None or other is None else min(mark, other)
+        marks[anime.rss_url] = mark
+    return marks
+
+def fetch_planned_feed(feed, wanted, profile=None):
+    """Fetch one planned request for the wanted {member URL: feed mark}.
+
+    Returns ({url: items}, requests made, URLs whose items were read successfully).
+    """
+    # Runs on a worker thread: feed reads (plus the feed cache) only, no qBittorrent writes.
+    with app.app_context(), profiler.tag(profile, f"feed {feed.url}"):
+        with host_limit(feed.url):
+            items, complete = fetch_feed(feed.url, stop_at_cached=True)
+        fetched = bool(items) or complete  # False after a failed fetch
+        if fetched:
+            with _feed_cache_stats_lock:
+                FEED_ITEMS[feed.url] = len(items)
+        if not feed.merged:
+            return {url: items for url in wanted}, 1, set(wanted) if fetched else set()
+        if not complete:
+            # A full page of new items (or an error) may hide older releases of any member.
+            fallback = list(wanted)
+        else:
+            # The cached page is capped, so a busy member can push another member's releases off
+            # it: a member last read before the page's oldest item falls back to its own feed.
+            covered_from = oldest_pub_date(items) if len(items) >= NYAA_PAGE_SIZE else None
+            if covered_from:
+                covered_from = covered_from.astimezone(dt_timezone.utc).replace(tzinfo=None)
+            fallback = [url for url, mark in wanted.items() if covered_from and (mark is None or mark < covered_from)]
+        results = feed_planner.route_items(items, [url for url in wanted if url not in fallback])
+        checked = set(results)
+        if fallback:
+            count_feed_cache('merge_fallbacks')
+        for url in fallback:
+            with host_limit(url):
+                results[url], complete = fetch_feed(url, stop_at_cached=True)
+            if results[url] or complete:
+                checked.add(url)
+        return results, 1 + len(fallback), checked
+
+def scan_save_path(save_path, profile=None):
+    with app.app_context(), profiler.tag(profile, f"disk {save_path}"):
+        return get_existing_episodes(save_path)
+
+def unseen_items(anime, items):
+    """Return the feed items not yet recorded in the show's SeenItem ledger."""
+    keys = {item['guid'] for item in items}
+    if not keys:
+        return []
+    seen = {
+        key for (key,) in db.session.query(SeenItem.item_key)
+        .filter(SeenItem.anime_id == anime.id, SeenItem.item_key.in_(keys))
+    }
+    return [item for item in items if item['guid'] not in seen]
+
+def process_new_items(anime, new_items, already_handled, qb):
+    recorded = set()
+    def mark_seen(item):
+        if item['guid'] not in recorded:
+            recorded.add(item['guid'])
+            published = parse_pub_date(item['pubDate'])
+            db.session.add(SeenItem(
+                anime_id=anime.id,
+                item_key=item['guid'],
+                episode=item['episode'],
+                published=published.astimezone(dt_timezone.utc).replace(tzinfo=None) if published else None
+            ))
+
+    episodes = {}
+    for item in new_items:
+        ep_num = item['episode']
+        if ep_num > 0 and ep_num not in already_handled:
+            episodes.setdefault(ep_num, []).append(item)
+        else:
+            mark_seen(item)
+    best_links = [
+        min(
+            episodes[ep_num],
+            key=lambda item: rank_torrent(
+                item,
+                anime.quality_preference,
+                '',
+                ''
+            )
+        )['link']
+        for ep_num in sorted(episodes.keys())
+    ]
+    if best_links:
+        # One batched add per show; nothing is marked seen unless qBittorrent accepted it.
+        qb_add_torrent_urls(qb, best_links, anime.save_path)
+    for ep_num in sorted(episodes.keys()):
+        for item in episodes[ep_num]:
+            mark_seen(item)
+        anime.last_episode = max(anime.last_episode, ep_num)
+
+# --- Adaptive polling ---
+CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', 1800))  # base poll interval per show
+POLL_MIN_INTERVAL = int(os.getenv('POLL_MIN_INTERVAL', 300))  # inside an expected release window
+POLL_MAX_INTERVAL = int(os.getenv('POLL_MAX_INTERVAL', 43200))  # ceiling for quiet feeds
+POLL_TICK = int(os.getenv('POLL_TICK', 60))  # how often the scheduler looks for due shows
+
+def airing_date_utc(anime):
+    # airing_date is stored as naive US/Pacific wall time (see get_airing_date_from_jikan).
+    if anime.airing_date is None:
+        return None
+    return timezone('US/Pacific').localize(anime.airing_date).astimezone(dt_timezone.utc).replace(tzinfo=None)
+
+def release_history(anime, limit=8):
+    """First publication time of each recent episode, newest first."""
+    first_seen = db.func.min(SeenItem.published)
+    rows = (
+        db.session.query(SeenItem.episode, first_seen)
+        .filter(SeenItem.anime_id == anime.id, SeenItem.episode > 0, SeenItem.published.isnot(None))
+        .group_by(SeenItem.episode)
+        .order_by(first_seen.desc())
+        .limit(limit)
+    )
+    return [published for _, published in rows]
+
+def schedule_show(anime, now, found_new):
+    history = release_history(anime)
+    release_at = polling.next_release(now, history, airing_date_utc(anime))
+    # Once this window's episode is in, the rest of the window is polled at the normal back-off.
+    anime.next_poll_at, anime.poll_interval = polling.schedule_next_poll(
+        now, anime.poll_interval, found_new, release_at, CHECK_INTERVAL, POLL_MIN_INTERVAL, POLL_MAX_INTERVAL,
+        released=polling.window_released(release_at, history)
+    )
+
 def monitor_rss_feeds():
     with app.app_context():
-        all_anime = TrackedAnime.query.all()
-        now_pst = datetime.now(timezone('US/Pacific'))
-        for anime in all_anime:
+        now = datetime.utcnow()
+        due_anime = TrackedAnime.query.filter(
+            db.or_(TrackedAnime.next_poll_at.is_(None), TrackedAnime.next_poll_at <= now)
+        ).all()
+        pending = []
+        for anime in due_anime:
             # Skip if not yet aired and airing date is in the future
-            if anime.status.lower() == "not yet aired" and anime.airing_date and anime.airing_date > now_pst:
+            airs_at = airing_date_utc(anime)
+            if anime.status.lower() == "not yet aired" and airs_at and airs_at > now:
                 app.logger.info(f"Skipping {anime.title}: Not aired yet (airs {anime.airing_date})")
+                anime.next_poll_at = airs_at - polling.WINDOW_BEFORE
                 continue
 
-            app.logger.info(f"Checking: {anime.title} ({anime.save_path}) [{anime.rss_url}]")
             if (
                 anime.status.lower() == "finished"
                 and anime.expected_episodes > 0
                 and anime.last_episode >= anime.expected_episodes
             ):
                 db.session.delete(anime)
-                db.session.commit()
                 continue
+            pending.append(anime)
+        db.session.commit()
 
+        if not pending:
+            return
+        profile = profiler.start('pass', 'monitor')
+        try:
+            with profiler.tag(profile, 'monitor'):
+                check_shows(pending, profile)
+        finally:
+            profiler.finish(profile, profile_dir())
+
+def check_shows(pending, profile=None):
+    """Fetch, match and download for the due shows of one monitor pass (inside its app context)."""
+    qb = get_qb_client()
+    try:
+        # One snapshot of qBittorrent's torrents serves every show in this pass.
+        downloading_index = get_downloading_index(qb)
+    except Exception as e:
+        app.logger.error(f"Monitoring error: {str(e)}")
+        return
+
+    started = time.monotonic()
+    # Nyaa can list an upload a little after its pubDate, so the mark trails the fetch.
+    checked_at = datetime.utcnow() - timedelta(minutes=10)
+    marks = feed_marks(pending)
+    plan = plan_monitor_feeds()
+    prune_unplanned_feeds(plan)
+    with ThreadPoolExecutor(max_workers=MONITOR_WORKERS, thread_name_prefix='monitor') as pool:
+        feed_futures = {}
+        for feed in plan:
+            wanted = {url: marks[url] for url in feed.members if url in marks}
+            if wanted:
+                future = pool.submit(fetch_planned_feed, feed, wanted, profile)
+                feed_futures.update((url, future) for url in wanted)
+        disk_futures = [pool.submit(scan_save_path, anime.save_path, profile) for anime in pending]
+        # Commit stage: apply side effects one show at a time, in tracking order.
+        for anime, disk_future in zip(pending, disk_futures):
+            app.logger.info(f"Checking: {anime.title} ({anime.save_path}) [{anime.rss_url}]")
+            new_items = []
+            profiler.tag_thread(profile, f"show {anime.title}")
             try:
-                items = parse_rss_feed(anime.rss_url)
-                existing_episodes = get_existing_episodes(anime.save_path)
-                session_api, qb_url = qb_login()
-                downloading_episodes = get_downloading_episodes(session_api, qb_url, anime.save_path)
-                already_handled = existing_episodes | downloading_episodes
-
-                episode_items = []
-                for item in items:
-                    ep_num = get_episode_number(item.findtext('title', ''))
-                    if ep_num > 0 and ep_num not in already_handled:
-                        episode_items.append((ep_num, item))
-                episodes = {}
-                for ep_num, item in episode_items:
-                    episodes.setdefault(ep_num, []).append(item)
-                for ep_num in sorted(episodes.keys()):
-                    best = sorted(
-                        episodes[ep_num],
-                        key=lambda item: rank_torrent(
-                            item,
-                            anime.quality_preference,
-                            '',
-                            ''
-                        )
-                    )[0]
-                    torrent_url = best.findtext('link')
-                    qb_add_torrent_url(session_api, qb_url, torrent_url, anime.save_path)
-                    anime.last_episode = max(anime.last_episode, ep_num)
-                    db.session.commit()
+                results, _, checked = feed_futures[anime.rss_url].result()
+                items = results[anime.rss_url]
+                existing_episodes = disk_future.result()
+                downloading_episodes = downloading_index.get(normalize_save_path(anime.save_path), set())
+                new_items = unseen_items(anime, items)
+                if new_items:
+                    process_new_items(anime, new_items, existing_episodes | downloading_episodes, qb)
                 if existing_episodes:
                     anime.last_episode = max(existing_episodes)
-                    db.session.commit()
+                if anime.rss_url in checked:
+                    anime.feed_checked_at = checked_at
+                db.session.commit()  # one transaction per show
             except Exception as e:
+                db.session.rollback()
+                metrics.inc('monitor_show_errors_total')
                 app.logger.error(f"Monitoring error for {anime.title}: {str(e)}")
+            try:
+                schedule_show(anime, datetime.utcnow(), bool(new_items))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Scheduling error for {anime.title}: {str(e)}")
+            profiler.tag_thread(profile, 'monitor')
+    requests_made = sum(
+        future.result()[1] for future in set(feed_futures.values()) if future.exception() is None
+    )
+    # Both only grow, so they stay valid counters; a pass with merge fallbacks can make more
+    # requests than it planned.
+    count_feed_cache('requests_planned', len(pending))
+    count_feed_cache('requests_made', requests_made)
+    metrics.observe('monitor_pass_seconds', time.monotonic() - started)
+    metrics.set_gauge('monitor_pass_shows', len(pending))
+    metrics.set_gauge('monitor_pass_feed_requests', requests_made)
+    app.logger.info(
+        f"Monitor pass checked {len(pending)} shows with {requests_made} feed requests "
+        f"(saved {len(pending) - requests_made}) in {time.monotonic() - started:.2f}s"
+    )
+
+# --- Backfill ---
+# Older episodes than the first RSS page holds are found by crawling the show's later result
+# pages (see backfill). Each run reads at most BACKFILL_MAX_PAGES pages per show, resuming
+# at the page stored in backfill_page, on BACKFILL_WORKERS threads through the rate-limited client.
+BACKFILL_INTERVAL = int(os.getenv('BACKFILL_INTERVAL', 900))
+BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', 2))
+BACKFILL_MAX_PAGES = int(os.getenv('BACKFILL_MAX_PAGES', 5))
+
+def fetch_backfill_page(rss_url, page):
+    """Items on one results page, or None if the fetch failed. Not cached: pages shift as releases arrive."""
+    url = backfill.page_url(rss_url, page)
+    try:
+        with host_limit(url), upstream.get(url, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            items = list(iter_rss_items(response.raw))
+    except Exception as e:
+        app.logger.warning(f"Backfill fetch failed for {url}: {str(e)}")
+        return None
+    metrics.inc('backfill_pages_total')
+    return items
+
+def seen_episodes(anime):
+    return {
+        episode for (episode,) in db.session.query(SeenItem.episode)
+        .filter(SeenItem.anime_id == anime.id, SeenItem.episode > 0).distinct()
+    }
+
+def run_backfill():
+    """Crawl older result pages of shows with missing episodes and download what is found."""
+    with app.app_context():
+        # A show waits for its first monitor check, which handles page 1.
+        shows = TrackedAnime.query.filter(
+            TrackedAnime.backfill_done.isnot(True), TrackedAnime.poll_interval.isnot(None)
+        ).all()
+        if not shows:
+            return
+        qb = get_qb_client()
+        try:
+            downloading_index = get_downloading_index(qb)
+        except Exception as e:
+            app.logger.error(f"Backfill error: {str(e)}")
+            return
+        crawls = []
+        for anime in shows:
+            covered = (
+                get_existing_episodes(anime.save_path)
+                | downloading_index.get(normalize_save_path(anime.save_path), set())
+                | seen_episodes(anime)
+            )
+            missing = backfill.missing_episodes(anime.expected_episodes, anime.last_episode, covered)
+            if missing:
+                crawls.append((anime, covered, missing))
+            elif anime.expected_episodes or anime.last_episode:
+                anime.backfill_done = True
+        db.session.commit()
+
+        with ThreadPoolExecutor(max_workers=BACKFILL_WORKERS, thread_name_prefix='backfill') as pool:
+            futures = [
+                pool.submit(
+                    backfill.crawl, partial(fetch_backfill_page, anime.rss_url),
+                    anime.backfill_page or backfill.FIRST_PAGE, missing, BACKFILL_MAX_PAGES, NYAA_PAGE_SIZE
+                )
+                for anime, covered, missing in crawls
+            ]
+            # Side effects one show at a time, like the monitor's commit stage.
+            for (anime, covered, missing), future in zip(crawls, futures):
+                try:
+                    found, next_page, done = future.result()
+                    items = unseen_items(anime, [item for episode in sorted(found) for item in found[episode]])
+                    if items:
+                        process_new_items(anime, items, covered, qb)
+                    app.logger.info(
+                        f"Backfill for {anime.title}: pages {anime.backfill_page or backfill.FIRST_PAGE}-{next_page - 1}, "
+                        f"found {len(found)} of {len(missing)} missing episodes{' (done)' if done else ''}"
+                    )
+                    anime.backfill_page = next_page
+                    anime.backfill_done = done
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Backfill error for {anime.title}: {str(e)}")
+
+# --- Scheduler ---
+# Importing this module (e.g. from a multi-worker WSGI server) starts no background work. The
+# scheduler runs in `python main.py` (unless SCHEDULER_MODE=off) or in a dedicated
+# `python main.py scheduler` process. Every scheduler competes for a lease row in the database
+# and only the current holder runs the monitor and rotates the API token; if it dies, another
+# scheduler takes over once the lease expires.
+SCHEDULER_MODE = os.getenv('SCHEDULER_MODE', 'auto')  # auto or off, for `python main.py`
+LEASE_TTL = int(os.getenv('SCHEDULER_LEASE_TTL', 90))  # seconds; renewed every LEASE_TTL / 3
+LEASE_NAME = 'scheduler'
+LEASE_HOLDER = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+
+_lease = {'valid_until': 0.0}  # monotonic deadline of the lease this process holds
+
+def is_leader():
+    return time.monotonic() < _lease['valid_until']
+
+def renew_lease():
+    """Take the scheduler lease if it is free or expired, or extend it if this process holds it."""
+    started = time.monotonic()
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=LEASE_TTL)
+    with app.app_context():
+        try:
+            held = SchedulerLease.query.filter(
+                SchedulerLease.name == LEASE_NAME,
+                db.or_(SchedulerLease.holder == LEASE_HOLDER, SchedulerLease.expires_at < now)
+            ).update({'holder': LEASE_HOLDER, 'expires_at': expires_at}, synchronize_session=False)
+            if not held:
+                db.session.add(SchedulerLease(name=LEASE_NAME, holder=LEASE_HOLDER, expires_at=expires_at))
+            db.session.commit()
+            held = True
+        except IntegrityError:
+            db.session.rollback()  # another process inserted the row first
+            held = False
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Scheduler lease renewal failed: {str(e)}")
+            held = False
+    was_leader = is_leader()
+    # Stop acting as leader a little before the lease can expire for the other processes.
+    _lease['valid_until'] = started + LEASE_TTL - LEASE_TTL / 3 if held else 0.0
+    if held != was_leader:
+        app.logger.info(f"Scheduler lease {'acquired' if held else 'lost'} by {LEASE_HOLDER}")
+    metrics.set_gauge('scheduler_leader', int(held))
+    return held
+
+def release_lease():
+    if not is_leader():
+        return
+    _lease['valid_until'] = 0.0
+    with app.app_context():
+        SchedulerLease.query.filter_by(name=LEASE_NAME, holder=LEASE_HOLDER).delete()
+        db.session.commit()
+
+def leader_only(func):
+    @wraps(func)
+    def wrapper():
+        if is_leader():
+            with app.app_context():
+                return func()
+    return wrapper
+
+def start_scheduler():
+    if scheduler.running:
+        return
+    renew_lease()
+    scheduler.add_job(renew_lease, 'interval', seconds=max(1, LEASE_TTL // 3))
+    scheduler.add_job(leader_only(rotate_api_token), 'interval', seconds=ROTATE_INTERVAL)
+    scheduler.add_job(leader_only(monitor_rss_feeds), 'interval', seconds=POLL_TICK)
+    scheduler.add_job(leader_only(run_backfill), 'interval', seconds=BACKFILL_INTERVAL)
+    # Picks up jobs of a worker process that died mid-job, once their heartbeat is stale.
+    scheduler.add_job(leader_only(job_queue.resume), 'interval', seconds=job_queue.heartbeat * 3)
+    scheduler.start()
+    atexit.register(release_lease)
 
-check_interval = int(os.getenv('CHECK_INTERVAL', 1800))
-scheduler.add_job(monitor_rss_feeds, 'interval', seconds=check_interval)
 
 @app.route('/')
 def index():
@@ -508,58 +1464,108 @@ def set_download_path():
             return redirect(next_page)
         return redirect(url_for('index'))
 
-    def get_dir_tree(root, depth=2):
-        tree = []
-        if depth < 0 or not os.path.isdir(root):
-            return tree
-        try:
-            for entry in os.scandir(root):
-                if entry.is_dir():
-                    subtree = get_dir_tree(entry.path, depth-1)
-                    tree.append({
-                        'name': entry.name,
-                        'path': entry.path,
-                        'children': subtree
-                    })
-        except Exception:
-            pass
-        return tree
-
-    dir_trees = []
-    if os.name == 'nt':
-        import string
-        from ctypes import windll
-        
-        bitmask = windll.kernel32.GetLogicalDrives()
-        for letter in string.ascii_uppercase:
-            if bitmask & 1:
-                drive = f"{letter}:\\"
-                if os.path.isdir(drive):
-                    dir_trees.append({
-                        'name': drive,
-                        'path': drive,
-                        'children': get_dir_tree(drive, depth=2)
-                    })
-            bitmask >>= 1
-    else:
-        roots = ['/']
-        for extra in ['/media', '/mnt']:
-            if os.path.isdir(extra):
-                roots.append(extra)
-        for root in roots:
-            dir_trees.append({
-                'name': root,
-                'path': root,
-                'children': get_dir_tree(root, depth=2)
-            })
-
     current_download_path = get_setting('download_path', '')
     return render_template(
         'set_download_path.html',
         current=current_download_path,
-        dir_tree=dir_trees
+        dir_tree=dir_tree.get_root_nodes()
     )
 
+@app.route('/api/dir-tree')
+def api_dir_tree():
+    # Lazy expansion for the folder pickers: one level per request, served from the tree cache.
+    path = request.args.get('path', '')
+    if not path:
+        return jsonify(dir_tree.get_root_nodes())
+    children = dir_tree.list_children(path, time.monotonic() + dir_tree.SCAN_BUDGET)
+    if children is None:
+        return jsonify({'error': 'Directory scan timed out'}), 503
+    return jsonify([{'name': child['name'], 'path': child['path'], 'children': None} for child in children])
+
+# --- Background jobs ---
+FEED_PREVIEW_MAX_AGE = int(os.getenv('FEED_PREVIEW_MAX_AGE', 60))  # seconds a parsed feed preview is reused
+
+@job_queue.handler('jikan_search')
+def jikan_search_job(query):
+    return [{
+        'mal_id': a['mal_id'],
+        'title': a['title'],
+        'year': a.get('year'),
+        'status': a.get('status', 'Unknown'),
+        'episodes': a.get('episodes', 0)
+    } for a in search_jikan(query)]
+
+@job_queue.handler('feed_preview')
+def feed_preview_job(rss_url):
+    rss_items, video_codecs, audio_codecs, languages, group_batch_flags, qualities = parse_rss_items_for_template(rss_url)
+    return {
+        'rss_url': rss_url,
+        'rss_items': rss_items,
+        'video_codecs': video_codecs,
+        'audio_codecs': audio_codecs,
+        'group_batch_flags': group_batch_flags,
+        'qualities': qualities,
+    }
+
+@job_queue.handler('airing_date')
+def airing_date_job(anime_id, mal_id):
+    airing_date = get_airing_date_from_jikan(mal_id)
+    anime = db.session.get(TrackedAnime, anime_id)
+    if anime and airing_date:
+        anime.airing_date = airing_date
+        db.session.commit()
+    return airing_date.isoformat() if airing_date else None
+
+QB_ADD_BATCH = int(os.getenv('QB_ADD_BATCH', 20))  # torrent URLs per /torrents/add call
+
+@job_queue.handler('torrent_add')
+def torrent_add_job(urls, save_path):
+    qb = get_qb_client()
+    added, errors = 0, []
+    for start in range(0, len(urls), QB_ADD_BATCH):
+        batch = urls[start:start + QB_ADD_BATCH]
+        try:
+            qb_add_torrent_urls(qb, batch, save_path)
+            added += len(batch)
+        except Exception as e:
+            app.logger.error(f"Giving up on {len(batch)} torrent(s) for {save_path!r}: {e}")
+            errors.append(str(e))
+    if errors and not added:
+        raise QBittorrentError(errors[-1])
+    return {'total': len(urls), 'added': added, 'failed': len(urls) - added, 'error': errors[-1] if errors else None}
+
+@job_queue.handler('top_completed')
+def top_completed_job():
+    return {'items': len(refresh_top_completed()['downloads'])}
+
+def render_job_pending(job, message, retry_url=''):
+    """Placeholder page that polls the job and reloads once it has finished."""
+    return render_template('job_pending.html', job=job, message=message, retry_url=retry_url)
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/result')
+def api_job_result(job_id):
+    job = job_queue.result(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['state'] == 'failed':
+        return jsonify(job), 500
+    return jsonify(job), 200 if job['state'] == 'done' else 202
+
+def start_search(query, rss_url):
+    if not rss_url:
+        formatted_title = quote_plus(query)
+        rss_url = NYAA_RSS_URL.format(formatted_title)
+    session['rss_url'] = rss_url
+    job_id = job_queue.submit('jikan_search', {'query': query})
+    return redirect(url_for('search_results', job_id=job_id))
+
 @app.route('/search', methods=['POST'])
 def search():
     # Check for download path first
@@ -571,21 +1577,7 @@ def search():
         session['next_after_download_path'] = url_for('resume_search')
         return redirect(url_for('set_download_path'))
 
-    query = request.form['query']
-    rss_url = request.form.get('rss_url', '').strip()
-    if not rss_url:
-        formatted_title = quote_plus(query)
-        rss_url = f"https://nyaa.si/?page=rss&q={formatted_title}&c=0_0&f=2"
-    session['rss_url'] = rss_url
-    results = search_jikan(query)
-    session['results'] = [{
-        'mal_id': a['mal_id'],
-        'title': a['title'],
-        'year': a.get('year'),
-        'status': a.get('status', 'Unknown'),
-        'episodes': a.get('episodes', 0)
-    } for a in results]
-    return render_template('search_results.html', results=session['results'])
+    return start_search(request.form['query'], request.form.get('rss_url', '').strip())
 
 @app.route('/resume-search')
 def resume_search():
@@ -594,18 +1586,16 @@ def resume_search():
     rss_url = session.pop('pending_search_rss_url', '').strip()
     if not query:
         return redirect(url_for('index'))
-    if not rss_url:
-        formatted_title = quote_plus(query)
-        rss_url = f"https://nyaa.si/?page=rss&q={formatted_title}&c=0_0&f=2"
-    session['rss_url'] = rss_url
-    results = search_jikan(query)
-    session['results'] = [{
-        'mal_id': a['mal_id'],
-        'title': a['title'],
-        'year': a.get('year'),
-        'status': a.get('status', 'Unknown'),
-        'episodes': a.get('episodes', 0)
-    } for a in results]
+    return start_search(query, rss_url)
+
+@app.route('/search/<job_id>')
+def search_results(job_id):
+    job = job_queue.result(job_id)
+    if job is None or job['kind'] != 'jikan_search':
+        return redirect(url_for('index'))
+    if job['state'] != 'done':
+        return render_job_pending(job, "Searching MyAnimeList...", retry_url=url_for('index'))
+    session['results'] = job['result']
     return render_template('search_results.html', results=session['results'])
 
 @app.route('/select/<int:mal_id>')
@@ -620,60 +1610,84 @@ def select_anime(mal_id):
     rss_url = session.get('rss_url')
     if not rss_url:
         formatted_title = quote_plus(anime['title'])
-        rss_url = f"https://nyaa.si/?page=rss&q={formatted_title}&c=0_0&f=2"
+        rss_url = NYAA_RSS_URL.format(formatted_title)
     # Use dynamic download path
     download_path = get_setting('download_path', '')
     if not download_path:
         return redirect(url_for('set_download_path'))
+    # Filter changes are answered from this session's snapshot of the parsed feed (see
+    # /api/feed-snapshot); a new snapshot is taken from the background feed_preview job.
+    snapshot_id = session.get('feed_snapshot_id')
+    snapshot = load_feed_snapshot(snapshot_id)
+    if snapshot is None or snapshot.rss_url != rss_url:
+        job = job_queue.result(job_queue.submit(
+            'feed_preview', {'rss_url': rss_url}, key=rss_url, max_age=FEED_PREVIEW_MAX_AGE
+        ))
+        if job['state'] != 'done':
+            return render_job_pending(job, f"Loading releases for {anime['title']}...")
+        snapshot_id = session['feed_snapshot_id'] = job['id']
+        snapshot = load_feed_snapshot(snapshot_id)
+        if snapshot is None:
+            snapshot = feed_index.FeedSnapshot(rss_url, job['result'])
+            feed_index.put(snapshot_id, snapshot)
     default_save_path = os.path.join(download_path, anime['title'])
-    # --- Directory tree for easier folder selection ---
-    def get_dir_tree(root, depth=2):
-        tree = []
-        if depth < 0 or not os.path.isdir(root):
-            return tree
-        try:
-            for entry in os.scandir(root):
-                if entry.is_dir():
-                    subtree = get_dir_tree(entry.path, depth-1)
-                    tree.append({
-                        'name': entry.name,
-                        'path': entry.path,
-                        'children': subtree
-                    })
-        except Exception:
-            pass
-        return tree
-    dir_tree = get_dir_tree(download_path, depth=2)
-    # -------------------------------------------------
     quality = request.args.get('quality') or ''
     video_codec = request.args.get('video_codec') or ''
     audio_codec = request.args.get('audio_codec') or ''
     language = request.args.get('language') or ''
-    rss_items, video_codecs, audio_codecs, languages, group_batch_flags, qualities = parse_rss_items_for_template(rss_url)
     return render_template(
         'confirm_download.html',
         title=anime['title'],
         rss_url=rss_url,
         default_save_path=default_save_path,
-        rss_items=rss_items,
+        rss_items=snapshot.grouped,
+        snapshot_id=snapshot_id,
+        visible_ids=set(snapshot.filter(quality, video_codec, audio_codec, language)),
+        total_items=len(snapshot.items),
         quality=quality,
-        video_codecs=video_codecs,
-        audio_codecs=audio_codecs,
+        video_codecs=snapshot.video_codecs,
+        audio_codecs=snapshot.audio_codecs,
         selected_video_codec=video_codec,
         selected_audio_codec=audio_codec,
         languages=ALL_LANGUAGES,
         selected_language=language,
-        group_batch_flags=group_batch_flags,
-        qualities=qualities,
-        dir_tree=dir_tree  # Pass the directory tree to the template
+        group_batch_flags=snapshot.group_batch_flags,
+        qualities=snapshot.qualities
+    )
+
+def load_feed_snapshot(snapshot_id):
+    """The feed snapshot with this id, rebuilt from its feed_preview job if another process built it."""
+    snapshot = feed_index.get(snapshot_id)
+    if snapshot is not None or not snapshot_id:
+        return snapshot
+    job = job_queue.result(snapshot_id)
+    if job is None or job['kind'] != 'feed_preview' or job['state'] != 'done' or not job['result'].get('rss_url'):
+        return None
+    if datetime.utcnow() - datetime.fromisoformat(job['finished_at']) > timedelta(seconds=feed_index.SNAPSHOT_TTL):
+        return None
+    snapshot = feed_index.FeedSnapshot(job['result']['rss_url'], job['result'])
+    feed_index.put(snapshot_id, snapshot)
+    return snapshot
+
+@app.route('/api/feed-snapshot/<snapshot_id>')
+def api_feed_snapshot(snapshot_id):
+    # Ids of the confirm page's releases matching the filters, by intersecting the facet indexes.
+    snapshot = load_feed_snapshot(snapshot_id) if snapshot_id == session.get('feed_snapshot_id') else None
+    if snapshot is None:
+        return jsonify({'error': 'Snapshot expired'}), 404
+    ids = snapshot.filter(
+        request.args.get('quality', ''),
+        request.args.get('video_codec', ''),
+        request.args.get('audio_codec', ''),
+        request.args.get('language', ''),
     )
+    return jsonify({'ids': ids, 'count': len(ids), 'total': len(snapshot.items)})
 
+@metrics.timed('jikan_anime_seconds')
 def get_airing_date_from_jikan(mal_id):
     # Jikan API returns UTC, convert to PST
-    url = f"https://api.jikan.moe/v4/anime/{mal_id}"
-    resp = requests.get(url)
-    if resp.status_code == 200:
-        data = resp.json().get('data', {})
+    data = jikan.anime(mal_id)
+    if data:
         aired_from = data.get('aired', {}).get('from')
         if aired_from:
             dt_utc = datetime.fromisoformat(aired_from.replace('Z', '+00:00'))
@@ -691,7 +1705,6 @@ def track():
         selected_torrents = request.form.getlist('selected_torrents')
         status = None
         expected_episodes = 0
-        airing_date = None
         mal_id = None
         for a in session.get('results', []):
             if a['title'] == title:
@@ -706,14 +1719,10 @@ def track():
             flash("This anime is finished and will not be tracked.", "warning")
             return redirect(url_for('tracking_list'))
 
-        if status == "not yet aired" and mal_id:
-            airing_date = get_airing_date_from_jikan(mal_id)
-
+        job_id = None
         if selected_torrents:
-            session_api, qb_url = qb_login()
-            for torrent_url in selected_torrents:
-                qb_add_torrent_url(session_api, qb_url, torrent_url, save_path)
-                time.sleep(2)
+            # Added in the background; the tracking list polls the job.
+            job_id = job_queue.submit('torrent_add', {'urls': selected_torrents, 'save_path': save_path})
         existing = TrackedAnime.query.filter_by(title=title, rss_url=rss_url, save_path=save_path).first()
         if not existing:
             new_anime = TrackedAnime(
@@ -722,15 +1731,17 @@ def track():
                 save_path=save_path,
                 quality_preference=quality,
                 status=status or 'Unknown',
-                expected_episodes=expected_episodes,
-                airing_date=airing_date
+                expected_episodes=expected_episodes
             )
             db.session.add(new_anime)
             db.session.commit()
+            if status == "not yet aired" and mal_id:
+                # Looked up in the background; until then the show is polled like an airing one.
+                job_queue.submit('airing_date', {'anime_id': new_anime.id, 'mal_id': mal_id})
         session.pop('results', None)
         session.pop('confirmed_title', None)
         session.pop('current_mal_id', None)
-        return redirect(url_for('tracking_list'))
+        return redirect(url_for('tracking_list', job=job_id))
     except Exception as e:
         app.logger.error(f"Tracking error: {str(e)}")
         db.session.rollback()
@@ -744,20 +1755,64 @@ def untrack(anime_id):
         db.session.commit()
     return redirect(url_for('tracking_list'))
 
+def get_downloading_torrents():
+    """Downloading torrents from the sync mirror, refreshed by one delta request unless the live feed keeps it current.
+
+    Full torrent dicts, the same shape as the torrents/info fallback; the trimmed status view is only for the stream.
+    """
+    feed = get_status_feed()
+    try:
+        if not feed.active:
+            feed.sync.refresh()
+        return feed.sync.downloading()
+    except Exception as e:
+        app.logger.warning(f"qBittorrent sync failed, falling back to torrents/info: {str(e)}")
+        return get_qb_client().torrents_info(filter="downloading")
+
 @app.route('/qb-status')
 def qb_status():
     try:
-        session_api, qb_url = qb_login()
-        resp = session_api.get(f"{qb_url}/api/v2/torrents/info", params={"filter": "downloading"})
-        torrents = resp.json()
+        torrents = get_downloading_torrents()
         return render_template('qb_status.html', torrents=torrents)
     except Exception as e:
         return f"Error fetching qBittorrent status: {e}", 500
 
+@app.route('/qb-status/stream')
+def qb_status_stream():
+    # Server-sent events for the status page: every viewer shares one poller (see TorrentStatusFeed).
+    feed = get_status_feed()
+    subscriber = feed.subscribe()
+
+    def events():
+        try:
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=15)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+                if event == 'reset':
+                    return
+        finally:
+            feed.unsubscribe(subscriber)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/tracking-list')
 def tracking_list():
     tracked_anime = TrackedAnime.query.all()
-    return render_template('tracking_list.html', tracked_anime=tracked_anime)
+    episodes_on_disk = get_indexed_episodes([anime.save_path for anime in tracked_anime])
+    with _feed_cache_stats_lock:
+        feed_cache_stats = dict(FEED_CACHE_STATS)
+    return render_template(
+        'tracking_list.html',
+        upstream_health=upstream.health(),
+        tracked_anime=tracked_anime,
+        episodes_on_disk=episodes_on_disk,
+        feed_cache_stats=feed_cache_stats
+    )
 
 @app.context_processor
 def inject_project_name():
@@ -774,5 +1829,16 @@ def kill_process():
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        migrate_db()
+        load_settings()
+    if sys.argv[1:] == ['scheduler']:
+        # Scheduler-only process, next to web workers that import the app without scheduling
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        start_scheduler()
+        job_queue.resume()
+        while True:
+            time.sleep(3600)
+    if SCHEDULER_MODE != 'off':
+        start_scheduler()
+    job_queue.resume()
     app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
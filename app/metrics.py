@@ -0,0 +1,124 @@
+"""In-process counters, gauges and timers, rendered in the Prometheus text format.
+
+Recording is a dict update under a lock; nothing is formatted until /metrics is scraped.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+PREFIX = 'nyaasifeed_'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_gauges = {}  # (name, labels) -> value
+_timers = {}  # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+_help = {}
+_collectors = []
+
+
+def describe(name, help_text):
+    _help[name] = help_text
+
+
+def register_collector(func):
+    """func() returns [(kind, name, labels dict, value)] sampled at scrape time."""
+    _collectors.append(func)
+    return func
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    index = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        series = _timers.get(key)
+        if series is None:
+            series = _timers[key] = [0] * (len(BUCKETS) + 2)
+        series[index] += 1
+        series[-1] += seconds
+
+
+@contextmanager
+def timer(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def timed(name, **labels):
+    """Decorator form of timer()."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        timers = {key: list(series) for key, series in _timers.items()}
+    for collect in _collectors:
+        for kind, name, labels, value in collect():
+            (counters if kind == 'counter' else gauges)[_key(name, labels)] = value
+
+    lines = []
+    typed = set()
+
+    def header(name, kind):
+        if name not in typed:
+            typed.add(name)
+            if name in _help:
+                lines.append(f"# HELP {PREFIX}{name} {_help[name]}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, 'counter')
+        lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+    for (name, labels), value in sorted(gauges.items()):
+        header(name, 'gauge')
+        lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+    for (name, labels), series in sorted(timers.items()):
+        header(name, 'histogram')
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), series[:-1]):
+            cumulative += count
+            lines.append(f"{PREFIX}{name}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {series[-1]}")
+        lines.append(f"{PREFIX}{name}_count{_labels(labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
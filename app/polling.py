@@ -0,0 +1,71 @@
+"""Adaptive per-show poll scheduling.
+
+Shows are polled every few minutes around their expected weekly release
+and back off exponentially while their feed stays quiet. All datetimes
+are naive UTC.
+"""
+import statistics
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+WEEK = 7 * 24 * 3600
+WINDOW_BEFORE = timedelta(minutes=30)
+WINDOW_AFTER = timedelta(hours=3)
+
+
+def _seconds(dt):
+    return (dt - EPOCH).total_seconds()
+
+
+def weekly_phase(release_times):
+    """Median offset into the week (seconds) of past releases, or None without enough history."""
+    if len(release_times) < 2:
+        return None
+    # Measure relative to the first sample so releases straddling the week boundary don't split.
+    anchor = _seconds(release_times[0]) % WEEK
+    offsets = []
+    for released in release_times:
+        delta = (_seconds(released) % WEEK - anchor) % WEEK
+        offsets.append(delta - WEEK if delta > WEEK / 2 else delta)
+    return (anchor + statistics.median(offsets)) % WEEK
+
+
+def next_release(now, release_times, airing_date=None):
+    """Expected time of the next release whose window has not ended yet, or None if unknown."""
+    phase = weekly_phase(release_times)
+    if phase is None:
+        if airing_date is None:
+            return None
+        phase = _seconds(airing_date) % WEEK
+    # Start a week back so a window that opened last week and is still running is found.
+    release = now - timedelta(seconds=_seconds(now) % WEEK - phase + WEEK)
+    while release + WINDOW_AFTER < now:
+        release += timedelta(seconds=WEEK)
+    return release
+
+
+def window_released(release_at, release_times):
+    """True if the newest of release_times (newest first) falls in the window around release_at."""
+    return bool(release_at and release_times and release_times[0] >= release_at - WINDOW_BEFORE)
+
+
+def schedule_next_poll(now, interval, found_new, release_at, base_interval, min_interval, max_interval,
+                       released=False):
+    """Return (next_poll_at, interval) after a poll.
+
+    interval resets to base_interval when the poll found new items and doubles otherwise.
+    Inside a release window that has not produced anything yet (released is False and this
+    poll found nothing), polls every min_interval.
+    """
+    if found_new or not interval:
+        interval = base_interval
+    else:
+        interval = min(interval * 2, max_interval)
+    next_poll = now + timedelta(seconds=interval)
+    if release_at is not None:
+        window_start = release_at - WINDOW_BEFORE
+        if window_start <= now <= release_at + WINDOW_AFTER and not (found_new or released):
+            next_poll = now + timedelta(seconds=min_interval)
+        elif now < window_start:
+            next_poll = min(next_poll, window_start)
+    return next_poll, interval
@@ -0,0 +1,145 @@
+"""On-demand sampling profiler for monitor passes and requests.
+
+Once armed, the next N monitor passes or requests are profiled: a background thread samples
+the stacks of the threads working for them every INTERVAL seconds, and each profile is
+written as folded stacks ("label;frame;frame... count" per line), the input format of
+flamegraph.pl and speedscope. Nothing is sampled while the profiler is not armed.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+INTERVAL = float(os.getenv('PROFILER_INTERVAL', 0.005))
+KEEP = int(os.getenv('PROFILER_KEEP', 50))  # profile files kept on disk
+
+_lock = threading.Lock()
+_armed = {'pass': 0, 'request': 0}
+_tags = {}  # thread ident -> (profile, label)
+_sampler = None
+
+
+class Profile:
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.started = time.time()
+        self.samples = Counter()
+
+
+def arm(passes=0, requests=0):
+    """Profile the next `passes` monitor passes and `requests` requests."""
+    global _sampler
+    with _lock:
+        _armed['pass'] = max(0, int(passes))
+        _armed['request'] = max(0, int(requests))
+        if (_armed['pass'] or _armed['request']) and _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name='profiler', daemon=True)
+            _sampler.start()
+    return status()
+
+
+def status():
+    with _lock:
+        return {'passes': _armed['pass'], 'requests': _armed['request'], 'active': len(_tags)}
+
+
+def start(kind, name):
+    """Return a Profile if the profiler is armed for kind (using up one), else None."""
+    with _lock:
+        if not _armed.get(kind):
+            return None
+        _armed[kind] -= 1
+    return Profile(kind, name)
+
+
+def tag_thread(profile, label):
+    if profile is not None:
+        with _lock:
+            _tags[threading.get_ident()] = (profile, label)
+
+
+def untag_thread():
+    with _lock:
+        _tags.pop(threading.get_ident(), None)
+
+
+@contextmanager
+def tag(profile, label):
+    """Attribute the current thread's samples to label in profile while inside the block."""
+    if profile is None:
+        yield
+        return
+    ident = threading.get_ident()
+    with _lock:
+        previous = _tags.get(ident)
+        _tags[ident] = (profile, label)
+    try:
+        yield
+    finally:
+        with _lock:
+            if previous is None:
+                _tags.pop(ident, None)
+            else:
+                _tags[ident] = previous
+
+
+def finish(profile, directory):
+    """Write profile as a .folded file under directory; returns its file name (None if not profiling)."""
+    if profile is None:
+        return None
+    with _lock:
+        samples = dict(profile.samples)
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(profile.started))
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', profile.name)[:60]
+    name = f"{stamp}-{int(profile.started * 1000) % 1000:03d}-{profile.kind}-{slug}.folded"
+    with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+        for stack, count in sorted(samples.items()):
+            f.write(f"{stack} {count}\n")
+    for old in list_profiles(directory)[KEEP:]:
+        try:
+            os.remove(os.path.join(directory, old['name']))
+        except OSError:
+            pass
+    return name
+
+
+def list_profiles(directory):
+    """Saved profiles, newest first."""
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.folded')]
+    except OSError:
+        return []
+    entries.sort(key=lambda entry: entry.name, reverse=True)
+    return [{'name': entry.name, 'size': entry.stat().st_size} for entry in entries]
+
+
+def _fold(frame, label):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    stack.append(label.replace(';', ','))
+    return ';'.join(reversed(stack))
+
+
+def _sample_loop():
+    global _sampler
+    while True:
+        time.sleep(INTERVAL)
+        with _lock:
+            if not _tags:
+                if not (_armed['pass'] or _armed['request']):
+                    _sampler = None
+                    return
+                continue
+            frames = sys._current_frames()
+            for ident, (profile, label) in _tags.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    profile.samples[_fold(frame, label)] += 1
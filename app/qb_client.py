@@ -0,0 +1,329 @@
+"""Shared, thread-safe qBittorrent Web API client."""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QBittorrentError(Exception):
+    pass
+
+
+class QBittorrentClient:
+    """One long-lived session: keeps the SID cookie, reuses keep-alive
+    connections and logs in again only when qBittorrent answers 403."""
+
+    def __init__(self, url, username, password, pool_size=10, timeout=15, login_backoff=60):
+        self.url = url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.login_backoff = login_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._login_lock = threading.Lock()
+        self._generation = 0  # bumped on every successful login
+        self._login_failed_at = None
+
+    def _login(self, generation):
+        with self._login_lock:
+            if generation != self._generation:
+                return  # another thread already logged in again
+            # Repeated bad logins get the client IP banned by qBittorrent, so back off after a failure.
+            if self._login_failed_at and time.monotonic() - self._login_failed_at < self.login_backoff:
+                raise QBittorrentError("qBittorrent login failed recently, not retrying yet")
+            with metrics.timer('qb_login_seconds'):
+                try:
+                    resp = self.session.post(
+                        f"{self.url}/api/v2/auth/login",
+                        data={'username': self.username, 'password': self.password},
+                        timeout=self.timeout
+                    )
+                except requests.RequestException:
+                    metrics.inc('qb_logins_total', outcome='error')
+                    raise
+            if resp.text != 'Ok.':
+                metrics.inc('qb_logins_total', outcome='failure')
+                self._login_failed_at = time.monotonic()
+                raise QBittorrentError("Failed to login to qBittorrent Web API")
+            metrics.inc('qb_logins_total', outcome='success')
+            self._login_failed_at = None
+            self._generation += 1
+
+    def ensure_logged_in(self):
+        if self._generation == 0:
+            self._login(0)
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        self.ensure_logged_in()
+        generation = self._generation
+        resp = self.session.request(method, f"{self.url}{path}", **kwargs)
+        if resp.status_code == 403:
+            self._login(generation)
+            resp = self.session.request(method, f"{self.url}{path}", **kwargs)
+        return resp
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def torrents_info(self, **params):
+        resp = self.get('/api/v2/torrents/info', params=params)
+        resp.raise_for_status()
+        return resp.json()
+
+    def add_torrents(self, urls, save_path, retries=3, backoff=1.0, max_backoff=30.0):
+        """Add several torrent URLs to save_path in one call.
+
+        Failed attempts are retried after a jittered exponential backoff; raises QBittorrentError
+        once retries run out.
+        """
+        for attempt in range(retries):
+            try:
+                with metrics.timer('qb_add_seconds'):
+                    resp = self.post('/api/v2/torrents/add', data={'urls': '\n'.join(urls), 'savepath': save_path})
+                if resp.status_code == 200 and resp.text.strip() != 'Fails.':
+                    metrics.inc('qb_added_torrents_total', len(urls))
+                    return
+                error = f"{resp.status_code} {resp.text.strip()}"
+            except (requests.RequestException, QBittorrentError) as e:
+                error = str(e)
+            logger.warning(f"Adding {len(urls)} torrent(s) failed (attempt {attempt + 1}): {error}")
+            if attempt + 1 < retries:
+                time.sleep(random.uniform(0, min(max_backoff, backoff * 2 ** attempt)))
+        metrics.inc('qb_add_failures_total')
+        raise QBittorrentError(f"Failed to add {len(urls)} torrent(s) after {retries} attempts: {error}")
+
+
+class TorrentSync:
+    """Local mirror of qBittorrent's torrent list, kept current from
+    /api/v2/sync/maindata so each refresh only transfers what changed."""
+
+    def __init__(self, client):
+        self.client = client
+        self.rid = 0
+        self.torrents = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, func):
+        """Call func(torrents, changed, removed, full_update) after every applied delta, under the lock.
+
+        func is first called with the current mirror as a full update, so a listener added after
+        earlier refreshes (e.g. by the monitor) starts from the same torrents as snapshot().
+        """
+        with self._lock:
+            self._listeners.append(func)
+            func(self.torrents, dict(self.torrents), [], True)
+
+    def refresh(self):
+        """Apply the next delta; returns (changed fields by hash, removed hashes)."""
+        with self._lock:
+            resp = self.client.get('/api/v2/sync/maindata', params={'rid': self.rid})
+            resp.raise_for_status()
+            data = resp.json()
+            if data.get('full_update'):
+                self.torrents = {}
+            changed = data.get('torrents', {})
+            for torrent_hash, fields in changed.items():
+                self.torrents.setdefault(torrent_hash, {'hash': torrent_hash}).update(fields)
+            removed = data.get('torrents_removed', [])
+            for torrent_hash in removed:
+                self.torrents.pop(torrent_hash, None)
+            self.rid = data.get('rid', self.rid)
+            for listener in self._listeners:
+                listener(self.torrents, changed, removed, bool(data.get('full_update')))
+            return changed, removed
+
+    def snapshot(self):
+        with self._lock:
+            return [dict(torrent) for torrent in self.torrents.values()]
+
+    def downloading(self):
+        """Full torrent dicts of the mirrored torrents in DOWNLOADING_STATES, like torrents/info?filter=downloading."""
+        with self._lock:
+            return [dict(torrent) for torrent in self.torrents.values() if torrent.get('state') in DOWNLOADING_STATES]
+
+    def locked(self, func):
+        """Return func(torrents) called under the lock, so no delta is applied or delivered meanwhile."""
+        with self._lock:
+            return func(self.torrents)
+
+
+# States qBittorrent's "downloading" filter selects.
+DOWNLOADING_STATES = {
+    'downloading', 'metaDL', 'forcedMetaDL', 'stalledDL', 'checkingDL', 'pausedDL', 'stoppedDL', 'queuedDL', 'forcedDL'
+}
+
+
+class TorrentStatusFeed:
+    """Live view of the downloading torrents for any number of viewers.
+
+    Every TorrentSync delta (whoever requested it) is turned into one event holding only
+    the changed STATUS_FIELDS, serialized once and queued to each subscriber. While anyone
+    is subscribed, a single poller thread refreshes the sync every `interval` seconds.
+    """
+
+    STATUS_FIELDS = ('name', 'progress', 'state', 'dlspeed', 'upspeed', 'eta')
+
+    def __init__(self, sync, interval=1.0, backlog=100):
+        self.sync = sync
+        self.interval = interval
+        self.backlog = backlog
+        self._visible = set()  # hashes currently shown as downloading
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        sync.add_listener(self._on_delta)
+
+    @property
+    def active(self):
+        """True while the poller keeps the sync mirror current."""
+        return self._thread is not None
+
+    def _view(self, torrent):
+        return {field: torrent.get(field) for field in self.STATUS_FIELDS}
+
+    def _snapshot(self, torrents):
+        """{hash: status fields} of the downloading torrents in the sync mirror."""
+        return {h: self._view(torrent) for h, torrent in torrents.items() if torrent.get('state') in DOWNLOADING_STATES}
+
+    def subscribe(self):
+        """Return a queue of (event, JSON data) pairs, starting with a snapshot.
+
+        Events are snapshot ({hash: fields}), delta ({"changed": {hash: fields}, "removed": [hash]}),
+        error, and reset: the subscriber fell behind and was dropped.
+        """
+        subscriber = queue.Queue(self.backlog)
+
+        def register(torrents):
+            # Under the sync lock, deltas are broadcast under it too: the snapshot is queued
+            # before the subscriber can receive any delta, and no delta falls in between.
+            subscriber.put(('snapshot', json.dumps(self._snapshot(torrents))))
+            with self._lock:
+                self._subscribers.add(subscriber)
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._poll, name='qb-status-feed', daemon=True)
+                    self._thread.start()
+
+        self.sync.locked(register)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _broadcast(self, event, payload):
+        data = json.dumps(payload)
+        with self._lock:
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.put_nowait((event, data))
+                except queue.Full:
+                    # Too far behind: drop it. Its last event tells the browser to reconnect,
+                    # which starts again from a snapshot.
+                    self._subscribers.discard(subscriber)
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+                    subscriber.put_nowait(('reset', '{}'))
+
+    def _on_delta(self, torrents, changed, removed, full_update):
+        if full_update:
+            self._visible = {h for h, torrent in torrents.items() if torrent.get('state') in DOWNLOADING_STATES}
+            self._broadcast('snapshot', {h: self._view(torrents[h]) for h in self._visible})
+            return
+        updated = {}
+        gone = [h for h in removed if h in self._visible]
+        self._visible.difference_update(gone)
+        for h, fields in changed.items():
+            torrent = torrents[h]
+            if torrent.get('state') in DOWNLOADING_STATES:
+                if h in self._visible:
+                    fields = {field: value for field, value in fields.items() if field in self.STATUS_FIELDS}
+                    if fields:
+                        updated[h] = fields
+                else:
+                    self._visible.add(h)
+                    updated[h] = self._view(torrent)
+            elif h in self._visible:
+                self._visible.discard(h)
+                gone.append(h)
+        if updated or gone:
+            self._broadcast('delta', {'changed': updated, 'removed': gone})
+
+    def _poll(self):
+        delay = self.interval
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.sync.refresh()
+                delay = self.interval
+            except Exception as e:
+                logger.warning(f"qBittorrent status poll failed: {e}")
+                self._broadcast('error', {'error': str(e)})
+                delay = min(delay * 2, 30)
+            time.sleep(delay)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide client, configured from QB_URL / QB_USERNAME / QB_PASSWORD."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = QBittorrentClient(
+                os.getenv('QB_URL'),
+                os.getenv('QB_USERNAME'),
+                os.getenv('QB_PASSWORD'),
+                pool_size=int(os.getenv('QB_POOL_SIZE', 10))
+            )
+        return _client
+
+
+_sync = None
+
+
+def get_sync():
+    """Return the process-wide TorrentSync for get_client()."""
+    global _sync
+    client = get_client()
+    with _client_lock:
+        if _sync is None:
+            _sync = TorrentSync(client)
+        return _sync
+
+
+_status_feed = None
+
+
+def get_status_feed():
+    """Return the process-wide TorrentStatusFeed for get_sync()."""
+    global _status_feed
+    sync = get_sync()
+    with _client_lock:
+        if _status_feed is None:
+            _status_feed = TorrentStatusFeed(sync, interval=float(os.getenv('QB_STATUS_INTERVAL', 1)))
+        return _status_feed
@@ -0,0 +1,60 @@
+"""Torrent title parsing shared by the web preview, the monitor and the disk index."""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+TitleInfo = namedtuple(
+    'TitleInfo',
+    ['group', 'episode', 'quality', 'video_codec', 'audio_codec', 'languages', 'is_batch']
+)
+
+GROUP_RE = re.compile(r'\[([^\[\]]+)\]')
+EPISODE_RE = re.compile(r'\b(\d{1,3})\b')
+QUALITY_RE = re.compile(r'([0-9]{3,4}p|4K)', re.IGNORECASE)
+VIDEO_CODEC_RE = re.compile(r'(HEVC|AVC|H\.264|H\.265)', re.IGNORECASE)
+AUDIO_CODEC_RE = re.compile(
+    r'(AAC|EAC3|FLAC|AC3|MP3|TRUEHD|DOLBY|ATMOS|DDP|DD|DOLBY DIGITAL|DOLBY TRUEHD|DOLBY ATMOS)',
+    re.IGNORECASE
+)
+LANG_RE = re.compile(r'\[([A-Z]{2,}(-[A-Z]{2,})?)\]')
+WORD_RE = re.compile(r'[^\W_]+')
+
+# Canonical codec names used when ranking torrents.
+VIDEO_CODEC_FAMILIES = {'HEVC': 'hevc', 'H.265': 'hevc', 'AVC': 'avc', 'H.264': 'avc'}
+
+TITLE_CACHE_SIZE = 8192
+
+
+def parse_episode(title):
+    match = EPISODE_RE.search(title)
+    return int(match.group(1)) if match else 0
+
+
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
+def parse_title(title):
+    """Parse a release title into a TitleInfo; results are memoized per title."""
+    match = GROUP_RE.search(title)
+    group = match.group(1) if match else "Other"
+    match = QUALITY_RE.search(title)
+    quality = match.group(1).lower() if match else ""
+    match = VIDEO_CODEC_RE.search(title)
+    video_codec = match.group(1).upper() if match else ""
+    match = AUDIO_CODEC_RE.search(title)
+    audio_codec = match.group(1).upper() if match else ""
+    excluded = {group, video_codec, audio_codec, 'BATCH'}
+    languages = tuple(m.group(1) for m in LANG_RE.finditer(title) if m.group(1) not in excluded)
+    return TitleInfo(
+        group=group,
+        episode=parse_episode(title),
+        quality=quality,
+        video_codec=video_codec,
+        audio_codec=audio_codec,
+        languages=languages,
+        is_batch='[BATCH]' in title.upper(),
+    )
+
+
+@lru_cache(maxsize=TITLE_CACHE_SIZE)
+def normalize_title(title):
+    """Lowercase words of title joined by single spaces, with brackets and punctuation dropped."""
+    return ' '.join(WORD_RE.findall(title.lower()))
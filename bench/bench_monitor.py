@@ -0,0 +1,106 @@
+"""Benchmark one monitor_rss_feeds pass against the local stub server.
+
+Usage: python bench/bench_monitor.py [--shows 150] [--latency 0.05] [--workers 1,2,4,8,16]
+
+Feeds are fetched one per show (FEED_MERGE_MAX=1) unless --merge-max is given, so every
+timed pass makes the same requests and the timings compare worker counts only.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import quote_plus
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'app'))
+
+from stub_server import StubState, show_name, start_stub_server  # noqa: E402
+
+WARMUP_PASSES = 5
+
+
+def monitor_pass(app_main, state):
+    """Run one monitor pass with every show due; returns (seconds, upstream requests by kind)."""
+    with app_main.app.app_context():
+        # Make every show due again; otherwise the adaptive scheduler skips them until their next poll.
+        app_main.TrackedAnime.query.update({'next_poll_at': None})
+        app_main.db.session.commit()
+    before = dict(state.counts)
+    started = time.perf_counter()
+    app_main.monitor_rss_feeds()
+    elapsed = time.perf_counter() - started
+    return elapsed, {k: state.counts[k] - before[k] for k in state.counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, default=150)
+    parser.add_argument('--items', type=int, default=12, help='items per feed')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the stub waits before each feed')
+    parser.add_argument('--workers', default='1,2,4,8,16')
+    parser.add_argument('--per-host', type=int, default=None,
+                        help='per-host limit (defaults to the worker count so the pool is the only bound)')
+    parser.add_argument('--merge-max', type=int, default=1,
+                        help='FEED_MERGE_MAX for the run (default 1: no merged queries)')
+    args = parser.parse_args()
+
+    state = StubState(items_per_feed=args.items, feed_latency=args.latency)
+    server, base_url = start_stub_server(state)
+    workdir = tempfile.mkdtemp(prefix='nyaa-bench-')
+    os.environ.update({
+        'ADMIN_USERNAME': 'bench',
+        'QB_URL': base_url,
+        'QB_USERNAME': 'bench',
+        'QB_PASSWORD': 'bench',
+        'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'bench.db'),
+        'HTTP_RATE': '100000',  # the stub is local: measure the app, not the per-host rate limit
+        'FEED_MERGE_MAX': str(args.merge_max),
+    })
+    import main as app_main
+
+    with app_main.app.app_context():
+        app_main.db.create_all()
+        for n in range(args.shows):
+            app_main.db.session.add(app_main.TrackedAnime(
+                title=show_name(n),
+                rss_url=f"{base_url}/?page=rss&q={quote_plus(show_name(n))}&c=0_0&f=2",
+                save_path=os.path.join(workdir, f"show-{n}"),
+                status='currently airing',
+            ))
+        app_main.db.session.commit()
+
+    # Warm up until two passes in a row make the same feed requests: the first pass queues every
+    # episode, and a merged plan can still fall back to per-show fetches on the next one.
+    previous = None
+    for _ in range(WARMUP_PASSES):
+        requests_made = monitor_pass(app_main, state)[1]['rss']
+        if requests_made == previous:
+            break
+        previous = requests_made
+
+    results = []
+    for workers in [int(w) for w in args.workers.split(',')]:
+        app_main.MONITOR_WORKERS = workers
+        app_main.MONITOR_PER_HOST = args.per_host or workers
+        app_main._host_limits.clear()
+        elapsed, requests_made = monitor_pass(app_main, state)
+        results.append({
+            'workers': workers,
+            'per_host': app_main.MONITOR_PER_HOST,
+            'pass_seconds': round(elapsed, 3),
+            'requests': requests_made,
+        })
+        print(f"workers={workers:<3} per_host={app_main.MONITOR_PER_HOST:<3} pass={elapsed:7.3f}s "
+              f"feed_requests={requests_made['rss']:<5} speedup={results[0]['pass_seconds'] / elapsed:5.2f}x",
+              file=sys.stderr)
+
+    print(json.dumps({'shows': args.shows, 'latency': args.latency, 'merge_max': args.merge_max,
+                      'results': results}, indent=2))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
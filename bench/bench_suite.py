@@ -0,0 +1,312 @@
+"""Offline benchmark suite: scripted scenarios against the local Nyaa/Jikan/qBittorrent stub.
+
+Usage: python bench/bench_suite.py [--scenarios monitor-100,feed-preview-75] [--repeats 30] [--out results.json]
+
+Each scenario runs in a fresh interpreter with its own SQLite database, against one stub
+server started by this process. Results are printed as JSON: latency percentiles per phase,
+peak traced memory of the app and the number of upstream requests each scenario made.
+"""
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import quote_plus
+from urllib.request import urlopen
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'app')
+sys.path.insert(0, BENCH_DIR)
+
+from stub_server import StubState, show_name, start_stub_server  # noqa: E402
+
+WARMUP_PASSES = 5  # most monitor passes run before timing, waiting for a stable feed plan
+
+SCENARIOS = {
+    'monitor-100': {'kind': 'monitor', 'shows': 100, 'items': 75, 'torrents': 10000},
+    'monitor-1k': {'kind': 'monitor', 'shows': 1000, 'items': 75, 'torrents': 10000},
+    'monitor-10k': {'kind': 'monitor', 'shows': 10000, 'items': 75, 'torrents': 10000, 'passes': 3},
+    'monitor-100-items-1000': {'kind': 'monitor', 'shows': 100, 'items': 1000, 'torrents': 10000},
+    'feed-preview-75': {'kind': 'feed_preview', 'items': 75},
+    'feed-preview-1000': {'kind': 'feed_preview', 'items': 1000},
+    'top-completed-75': {'kind': 'top_completed', 'items': 75},
+    'top-completed-1000': {'kind': 'top_completed', 'items': 1000},
+    'rank-torrent-1000': {'kind': 'rank_torrent', 'items': 1000},
+    'qb-status-10k': {'kind': 'qb_status', 'torrents': 10000},
+}
+
+
+def percentiles(samples):
+    """Latency summary in milliseconds (nearest-rank percentiles)."""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+
+    def rank(p):
+        return round(ordered[max(0, -(-len(ordered) * p // 100) - 1)] * 1000, 3)
+
+    return {
+        'n': len(ordered),
+        'p50': rank(50),
+        'p90': rank(90),
+        'p99': rank(99),
+        'max': round(ordered[-1] * 1000, 3),
+        'mean': round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+def timed(func, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def peak_memory(func):
+    """Peak Python heap (bytes) allocated while func runs."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def stub_counts(stub_url):
+    """Upstream requests served so far by the stub (which lives in the parent process)."""
+    with urlopen(f"{stub_url}/_stub/counts", timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+# --- Scenario bodies (run in the child interpreter) ---
+
+def import_app(stub_url, workdir):
+    os.environ.update({
+        'ADMIN_USERNAME': 'bench',
+        'ADMIN_PASSWORD_HASH': base64.b64encode(b'bench').decode(),
+        'QB_URL': stub_url,
+        'QB_USERNAME': 'bench',
+        'QB_PASSWORD': 'bench',
+        'NYAA_URL': stub_url,
+        'JIKAN_API_URL': stub_url + '/v4/anime',
+        'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'bench.db'),
+        # The stub is local and serves Nyaa and Jikan from one host: measure the app, not the rate limits.
+        'HTTP_RATE': '100000',
+        'JIKAN_RATE': '100000',
+    })
+    sys.path.insert(0, APP_DIR)
+    import main as app_main
+    with app_main.app.app_context():
+        app_main.migrate_db()
+    return app_main
+
+
+def logged_in_client(app_main):
+    client = app_main.app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    return client
+
+
+def run_monitor(app_main, config, repeats, workdir):
+    shows = config['shows']
+    with app_main.app.app_context():
+        app_main.db.session.add_all([
+            app_main.TrackedAnime(
+                title=show_name(n),
+                rss_url=app_main.NYAA_RSS_URL.format(quote_plus(show_name(n))),
+                save_path=os.path.join(workdir, f"show-{n}"),
+                status='currently airing',
+            )
+            for n in range(shows)
+        ])
+        app_main.db.session.commit()
+
+    def monitor_pass():
+        with app_main.app.app_context():
+            app_main.TrackedAnime.query.update({'next_poll_at': None})  # every show is due
+            app_main.db.session.commit()
+        app_main.monitor_rss_feeds()
+
+    def feed_requests(func):
+        before = stub_counts(os.environ['NYAA_URL'])['rss']
+        func()
+        return stub_counts(os.environ['NYAA_URL'])['rss'] - before
+
+    cold = timed(monitor_pass, 1)  # every item is new: queues all episodes, fills every cache
+    # Warm up until two passes in a row make the same feed requests, so merged queries that
+    # still fall back to per-show fetches are not mixed into the timed passes.
+    previous = None
+    for _ in range(WARMUP_PASSES):
+        requests_made = feed_requests(monitor_pass)
+        if requests_made == previous:
+            break
+        previous = requests_made
+    passes = []
+    pass_requests = []
+    for _ in range(config.get('passes', min(repeats, 5))):
+        before = stub_counts(os.environ['NYAA_URL'])['rss']
+        passes.extend(timed(monitor_pass, 1))
+        pass_requests.append(stub_counts(os.environ['NYAA_URL'])['rss'] - before)
+    latency = {'cold_pass': percentiles(cold), 'pass': percentiles(passes)}
+    return latency, monitor_pass, {'feed_requests_per_pass': pass_requests}
+
+
+def run_feed_preview(app_main, config, repeats, workdir):
+    rss_url = app_main.NYAA_RSS_URL.format(quote_plus(show_name(1)))
+
+    def preview():
+        with app_main.app.app_context():
+            app_main.parse_rss_items_for_template(rss_url)
+
+    def cold_preview():
+        with app_main.app.app_context():
+            app_main.FeedCache.query.delete()
+            app_main.db.session.commit()
+        preview()
+
+    cold = timed(cold_preview, repeats)
+    warm = timed(preview, repeats)
+    return {'cold': percentiles(cold), 'warm': percentiles(warm)}, cold_preview
+
+
+def run_top_completed(app_main, config, repeats, workdir):
+    client = logged_in_client(app_main)
+    refresh = timed(app_main.refresh_top_completed, repeats)
+
+    def route():
+        resp = client.get('/top-completed?page=2&sort=size')
+        assert resp.status_code == 200, resp.status_code
+
+    warm = timed(route, repeats)
+    return {'refresh': percentiles(refresh), 'route': percentiles(warm)}, app_main.refresh_top_completed
+
+
+def run_rank_torrent(app_main, config, repeats, workdir):
+    with app_main.app.app_context():
+        items = app_main.parse_rss_feed(app_main.NYAA_RSS_URL.format(quote_plus(show_name(1))))
+
+    def rank_all():
+        for item in items:
+            app_main.rank_torrent(item, '1080p', 'HEVC', 'AAC')
+
+    def rank_cold():
+        app_main.parse_title.cache_clear()
+        rank_all()
+
+    cold = timed(rank_cold, repeats)
+    warm = timed(rank_all, repeats)
+    return {'rank_all_cold': percentiles(cold), 'rank_all_warm': percentiles(warm)}, rank_cold
+
+
+def run_qb_status(app_main, config, repeats, workdir):
+    from qb_client import TorrentSync
+    qb = app_main.get_qb_client()
+    client = logged_in_client(app_main)
+
+    def route():
+        resp = client.get('/qb-status')
+        assert resp.status_code == 200, resp.status_code
+
+    app_main.get_downloading_index(qb)  # first sync pulls the full list
+    phases = {
+        'sync_delta': percentiles(timed(lambda: app_main.get_downloading_index(qb), repeats)),
+        'sync_full': percentiles(timed(lambda: TorrentSync(qb).refresh(), repeats)),
+        'torrents_info': percentiles(timed(qb.torrents_info, repeats)),
+        'route': percentiles(timed(route, repeats)),
+    }
+    return phases, lambda: TorrentSync(qb).refresh()
+
+
+RUNNERS = {
+    'monitor': run_monitor,
+    'feed_preview': run_feed_preview,
+    'top_completed': run_top_completed,
+    'rank_torrent': run_rank_torrent,
+    'qb_status': run_qb_status,
+}
+
+
+def run_child(name, stub_url, repeats):
+    config = SCENARIOS[name]
+    workdir = tempfile.mkdtemp(prefix='nyaa-bench-')
+    app_main = import_app(stub_url, workdir)
+    before = stub_counts(stub_url)
+    started = time.perf_counter()
+    latency, representative, *extra = RUNNERS[config['kind']](app_main, config, repeats, workdir)
+    elapsed = time.perf_counter() - started
+    requests_made = stub_counts(stub_url)
+    result = {
+        'scenario': name,
+        'params': config,
+        'seconds': round(elapsed, 3),
+        'latency_ms': latency,
+        # Measured on one extra run, so tracing does not slow down the timed phases.
+        'peak_memory_bytes': peak_memory(representative),
+        'requests': {key: requests_made[key] - before.get(key, 0) for key in requests_made},
+    }
+    for details in extra:
+        result.update(details)
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--repeats', type=int, default=30, help='timed runs per phase')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the stub waits before each feed')
+    parser.add_argument('--out', help='also write the JSON results to this file')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--stub', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.stub, args.repeats)
+        return
+
+    names = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    state = StubState(feed_latency=args.latency)
+    server, stub_url = start_stub_server(state)
+    results = []
+    for name in names:
+        config = SCENARIOS[name]
+        state.configure(
+            items_per_feed=config.get('items', 75),
+            torrents=config.get('torrents', 0),
+            keep_added=config['kind'] != 'monitor',  # a cold pass adds every episode of every show
+        )
+        print(f"running {name}...", file=sys.stderr)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', name, '--stub', stub_url,
+             '--repeats', str(args.repeats)],
+            cwd=APP_DIR, stdout=subprocess.PIPE, text=True
+        )
+        if proc.returncode != 0:
+            results.append({'scenario': name, 'params': config, 'error': f"exit status {proc.returncode}"})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    server.shutdown()
+
+    report = json.dumps({
+        'python': sys.version.split()[0],
+        'repeats': args.repeats,
+        'feed_latency': args.latency,
+        'results': results,
+    }, indent=2)
+    print(report)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Micro-benchmark for title_parser.parse_title against the previous inline parsing.
+
+Usage: python bench/bench_title_parser.py [--rounds 200]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'app'))
+
+import title_parser  # noqa: E402
+
+
+def legacy_parse(title):
+    # The per-call parsing parse_rss_items_for_template and get_episode_number used to do.
+    group_regex = re.compile(r'\[([^\[\]]+)\]')
+    video_codec_regex = re.compile(r'(HEVC|AVC|H\.264|H\.265)', re.IGNORECASE)
+    audio_codec_regex = re.compile(
+        r'(AAC|EAC3|FLAC|AC3|MP3|TRUEHD|DOLBY|ATMOS|DDP|DD|DOLBY DIGITAL|DOLBY TRUEHD|DOLBY ATMOS)',
+        re.IGNORECASE
+    )
+    lang_regex = re.compile(r'\[([A-Z]{2,}(-[A-Z]{2,})?)\]')
+    quality_regex = re.compile(r'([0-9]{3,4}p|4K)', re.IGNORECASE)
+    match = group_regex.search(title)
+    group = match.group(1) if match else "Other"
+    video_codec_match = video_codec_regex.search(title)
+    audio_codec_match = audio_codec_regex.search(title)
+    video_codec = video_codec_match.group(1).upper() if video_codec_match else ""
+    audio_codec = audio_codec_match.group(1).upper() if audio_codec_match else ""
+    langs = [m.group(1) for m in lang_regex.finditer(title)
+             if m.group(1) not in [group, video_codec, audio_codec, 'BATCH']]
+    quality_match = quality_regex.search(title)
+    episode_match = re.search(r'\b(\d{1,3})\b', title)
+    return (group, int(episode_match.group(1)) if episode_match else 0,
+            quality_match.group(1).lower() if quality_match else "",
+            video_codec, audio_codec, tuple(langs), '[BATCH]' in title.upper())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--corpus', default=os.path.join(BENCH_DIR, 'data', 'nyaa_titles.txt'))
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding='utf-8') as f:
+        titles = [line.strip() for line in f if line.strip()]
+    for title in titles:
+        if tuple(title_parser.parse_title(title)) != legacy_parse(title):
+            sys.exit(f"parse mismatch for {title!r}")
+
+    def run_legacy():
+        for title in titles:
+            legacy_parse(title)
+
+    def run_cold():
+        title_parser.parse_title.cache_clear()
+        for title in titles:
+            title_parser.parse_title(title)
+
+    def run_warm():
+        for title in titles:
+            title_parser.parse_title(title)
+
+    per_title = {}
+    for name, fn in (('legacy', run_legacy), ('cold', run_cold), ('warm', run_warm)):
+        seconds = min(timeit.repeat(fn, number=args.rounds, repeat=5))
+        per_title[name] = seconds / (args.rounds * len(titles)) * 1e6
+        print(f"{name:<7} {per_title[name]:8.2f} us/title", file=sys.stderr)
+    print(json.dumps({'titles': len(titles), 'us_per_title': {k: round(v, 3) for k, v in per_title.items()}}))
+
+
+if __name__ == '__main__':
+    main()
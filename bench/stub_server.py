@@ -0,0 +1,253 @@
+"""Local stand-in for Nyaa RSS, the Jikan API and the qBittorrent Web API, used by the benchmarks."""
+import hashlib
+import json
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+RSS_HEADER = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<rss xmlns:atom="http://www.w3.org/2005/Atom" xmlns:nyaa="https://nyaa.si/xmlns/nyaa" version="2.0">\n'
+    '<channel><title>Nyaa - stub</title><link>http://stub/</link>\n'
+)
+RSS_FOOTER = '</channel></rss>\n'
+PAGE_SIZE = 75  # Nyaa's RSS page size
+
+
+def show_name(n):
+    """Digit-free show title, so the only number in a release title is the episode."""
+    letters = ''
+    while True:
+        n, rem = divmod(n, 26)
+        letters = chr(ord('a') + rem) + letters
+        if not n:
+            break
+    return 'Show ' + letters.capitalize()
+
+
+def render_item(base_url, query, episode, quality, published):
+    title = f"[StubSubs] {query} - {episode:02d} ({quality}) [ABCD{episode:04d}].mkv"
+    digest = hashlib.md5(f"{query}|{episode}|{quality}".encode('utf-8')).hexdigest()[:10]
+    link = f"{base_url}/download/{digest}.torrent"
+    return link, title, (
+        '<item>'
+        f'<title>{escape(title)}</title>'
+        f'<link>{escape(link)}</link>'
+        f'<guid isPermaLink="true">{escape(link)}</guid>'
+        f'<pubDate>{formatdate(published)}</pubDate>'
+        '<nyaa:seeders>10</nyaa:seeders><nyaa:leechers>1</nyaa:leechers>'
+        '<nyaa:downloads>100</nyaa:downloads>'
+        '<nyaa:category>Anime - English-translated</nyaa:category>'
+        '<nyaa:size>1.4 GiB</nyaa:size>'
+        '</item>\n'
+    )
+
+
+def make_torrent(link, name, save_path, progress=0.0):
+    return {
+        'hash': hashlib.sha1(link.encode('utf-8')).hexdigest(),
+        'name': name,
+        'save_path': save_path,
+        'state': 'downloading',
+        'progress': progress,
+        'dlspeed': 0,
+        'upspeed': 0,
+        'eta': 8640000,
+    }
+
+
+class StubState:
+    def __init__(self, items_per_feed=12, feed_latency=0.05):
+        self.items_per_feed = items_per_feed
+        self.feed_latency = feed_latency
+        self.epoch = time.time()
+        self.jikan_latency = 0.0
+        self.sid = 'stub'
+        self.keep_added = True  # False: count adds without growing the torrent list
+        self.lock = threading.Lock()
+        self.titles = {}
+        self.torrents = []
+        self.counts = {'rss': 0, 'rss_304': 0, 'jikan': 0, 'login': 0, 'info': 0, 'sync': 0, 'add': 0}
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def configure(self, items_per_feed=None, feed_latency=None, jikan_latency=None, torrents=None,
+                  keep_added=None):
+        """Reset the stub for a new scenario; torrents preloads that many torrents into the fake client."""
+        with self.lock:
+            if items_per_feed is not None:
+                self.items_per_feed = items_per_feed
+            if feed_latency is not None:
+                self.feed_latency = feed_latency
+            if jikan_latency is not None:
+                self.jikan_latency = jikan_latency
+            if keep_added is not None:
+                self.keep_added = keep_added
+            self.titles = {}
+            self.torrents = [
+                make_torrent(f"preload-{n}", f"[StubSubs] {show_name(n % 500)} - {n // 500 % 100:02d} (1080p).mkv",
+                             f"/downloads/{show_name(n % 500)}", progress=(n % 100) / 100)
+                for n in range(torrents or 0)
+            ]
+            self.counts = dict.fromkeys(self.counts, 0)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without TCP_NODELAY every response on a
+    # keep-alive connection waits out the client's delayed ACK (~40 ms).
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def send_body(self, body, content_type='text/plain', status=200, headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorized(self):
+        return f"SID={self.state.sid}" in (self.headers.get('Cookie') or '')
+
+    def read_form(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return parse_qs(self.rfile.read(length).decode('utf-8'))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path == '/' and params.get('page') == ['rss']:
+            self.state.count('rss')
+            time.sleep(self.state.feed_latency)
+            page = int(params['p'][0]) if 'p' in params else None
+            body = self.render_feed(params.get('q', [''])[0], page).encode('utf-8')
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                self.state.count('rss_304')
+                self.send_body(b'', status=304, headers={'ETag': etag})
+            else:
+                self.send_body(body, 'application/xml', headers={'ETag': etag})
+        elif url.path == '/_stub/counts':
+            with self.state.lock:
+                body = json.dumps(self.state.counts)
+            self.send_body(body, 'application/json')
+        elif url.path.startswith('/v4/anime'):
+            self.state.count('jikan')
+            time.sleep(self.state.jikan_latency)
+            self.send_body(json.dumps({'data': self.render_jikan(url.path, params)}), 'application/json')
+        elif url.path.startswith('/api/v2/') and not self.authorized():
+            self.send_body('Forbidden', status=403)
+        elif url.path == '/api/v2/sync/maindata':
+            self.state.count('sync')
+            rid = int(params.get('rid', ['0'])[0])
+            with self.state.lock:
+                # Torrents are append-only here, so the list length doubles as the response id.
+                delta = self.state.torrents[rid:] if rid <= len(self.state.torrents) else self.state.torrents
+                body = json.dumps({
+                    'rid': len(self.state.torrents),
+                    'full_update': rid == 0,
+                    'torrents': {torrent['hash']: torrent for torrent in delta},
+                })
+            self.send_body(body, 'application/json')
+        elif url.path == '/api/v2/torrents/info':
+            self.state.count('info')
+            with self.state.lock:
+                body = json.dumps(self.state.torrents)
+            self.send_body(body, 'application/json')
+        else:
+            self.send_body('Not Found', status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        form = self.read_form() if url.path != '/_stub/config' else {}
+        if url.path == '/api/v2/auth/login':
+            self.state.count('login')
+            self.send_body('Ok.', headers={'Set-Cookie': f'SID={self.state.sid}; path=/'})
+        elif url.path.startswith('/api/v2/') and not self.authorized():
+            self.send_body('Forbidden', status=403)
+        elif url.path == '/api/v2/torrents/add':
+            self.state.count('add')
+            save_path = form.get('savepath', [''])[0]
+            with self.state.lock:
+                if self.state.keep_added:
+                    for link in form.get('urls', [''])[0].splitlines():
+                        self.state.torrents.append(make_torrent(link, self.state.titles.get(link, link), save_path))
+            self.send_body('Ok.')
+        elif url.path == '/_stub/config':
+            # Lets a benchmark running in another process reset the stub between scenarios.
+            length = int(self.headers.get('Content-Length') or 0)
+            self.state.configure(**json.loads(self.rfile.read(length) or b'{}'))
+            self.send_body('Ok.')
+        else:
+            self.send_body('Not Found', status=404)
+
+    def render_jikan(self, path, params):
+        def anime(mal_id):
+            return {
+                'mal_id': mal_id,
+                'title': show_name(mal_id),
+                'year': 2026,
+                'status': 'Currently Airing',
+                'episodes': 12,
+                'aired': {'from': '2026-10-03T15:00:00+00:00'},
+            }
+        mal_id = path[len('/v4/anime/'):]
+        if mal_id.isdigit():
+            return anime(int(mal_id))
+        limit = int(params.get('limit', ['5'])[0])
+        return [anime(n) for n in range(1, limit + 1)]
+
+    def render_feed(self, query, page=None):
+        base_url = f"http://{self.headers.get('Host')}"
+        now = self.state.epoch
+        entries = []
+        # "(a)|(b)" is a merged search: interleave each show's releases newest first, one page at most.
+        # An empty query is the global feed (e.g. Top Completed): releases from many shows.
+        shows = [part.strip('()') for part in query.split('|')] if query else [None]
+        for show in shows:
+            for n in range(self.state.items_per_feed):
+                episode = (self.state.items_per_feed - 1 - n) // 2 + 1  # newest item is the latest episode
+                quality = '1080p' if n % 2 else '720p'
+                entries.append((now - n * 3600, show or show_name(n % 50), episode, quality))
+        entries.sort(key=lambda entry: -entry[0])
+        if page is None:
+            entries = entries[:max(self.state.items_per_feed, PAGE_SIZE)]
+        else:
+            # "&p=N" pages through every release, PAGE_SIZE at a time, like Nyaa's search results.
+            entries = entries[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        parts = [RSS_HEADER]
+        for published, show, episode, quality in entries:
+            link, title, xml = render_item(base_url, show, episode, quality, published)
+            with self.state.lock:
+                self.state.titles[link] = title
+            parts.append(xml)
+        parts.append(RSS_FOOTER)
+        return ''.join(parts)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default backlog of 5 drops connections from larger worker pools
+
+
+def start_stub_server(state):
+    """Start the stub on a free localhost port; returns (server, base_url)."""
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"